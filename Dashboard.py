@@ -1,4 +1,5 @@
 import streamlit as st
+from glucoguard import media, warmup
 
 
 st.set_page_config(
@@ -9,7 +10,10 @@ st.set_page_config(
 )
 
 # Sidebar configuration
-st.sidebar.image("./assets/glucoguard-logo.png",)
+media.sidebar_logo()
+
+# Preload the libraries the other pages import lazily
+warmup.start()
 
 #st.sidebar.success("Select a tab above.")
 
@@ -35,8 +39,5 @@ designed specifically for healthcare professionals such as physicians, nurses, a
 Please watch the video below to learn more about the functionality offered in this web dashboard.
 """)
 
-# Embed a video from a local file
-video_file = open('./assets/WhatsApp Video 2024-10-23 at 01.43.43_f39b376a.mp4', 'rb')
-video_bytes = video_file.read()
-
-st.video(video_bytes)
\ No newline at end of file
+# Embed the walkthrough video, if the deployment has it
+media.video(media.WALKTHROUGH_VIDEO)
\ No newline at end of file
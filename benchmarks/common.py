@@ -0,0 +1,44 @@
+"""Timing and memory helpers shared by the benchmark scripts."""
+import gc
+import statistics
+import time
+import tracemalloc
+
+
+def timed(fn, repeat):
+    """Run `fn` `repeat` times; return the best and median wall time in seconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times), statistics.median(times)
+
+
+def peak_memory(fn, runs=3):
+    """Peak of Python and NumPy allocations of `fn` in MiB: the smallest of `runs` traced runs.
+
+    `fn` is run once untraced first, so that the process caches it fills do
+    not count towards the peak, and the garbage of earlier runs is collected
+    before each traced run.
+    """
+    fn()
+    peaks = []
+    for _ in range(runs):
+        gc.collect()
+        tracemalloc.start()
+        try:
+            fn()
+            peaks.append(tracemalloc.get_traced_memory()[1] / 2 ** 20)
+        finally:
+            tracemalloc.stop()
+    return min(peaks)
+
+
+def measure(fn, repeat, memory=True):
+    """Result record of `fn`: best and median seconds and (optionally) peak MiB."""
+    best, median = timed(fn, repeat)
+    result = {'seconds': best, 'median_seconds': median, 'repeat': repeat}
+    if memory:
+        result['peak_mb'] = peak_memory(fn, min(repeat, 3))
+    return result
@@ -0,0 +1,92 @@
+"""Check the import time of every dashboard page against its budget.
+
+Each page's top-level import statements are run in a fresh interpreter that
+has already imported streamlit (as the server has), the best of `--repeat`
+runs is compared with the page's budget, and the page must not have imported
+any of `glucoguard.warmup.HEAVY_MODULES` beyond what streamlit loads. Exits
+with a non-zero status when a page is over budget or imports a heavy module.
+
+Run with:
+    python benchmarks/import_time.py [--repeat 3]
+"""
+import argparse
+import ast
+import glob
+import json
+import os
+import subprocess
+import sys
+
+REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO)
+
+from glucoguard.warmup import HEAVY_MODULES  # noqa: E402
+
+# Seconds spent in a page's top-level imports, on top of streamlit itself
+BUDGETS = {
+    'Dashboard.py': 0.2,
+    'pages/1_Data_Summary_📈.py': 0.75,
+    'pages/2_Data_Investigation_🔎.py': 0.75,
+    'pages/3_Readmission_Prediction_🛌.py': 0.75,
+    'pages/4_Patient_History_📋.py': 0.75,
+    'pages/5_About_❔.py': 0.2,
+}
+DEFAULT_BUDGET = 1.0
+
+_MEASURE = """
+import json, sys, time
+import streamlit
+preloaded = set(sys.modules)
+start = time.perf_counter()
+exec(compile(sys.argv[1], 'imports', 'exec'), {})
+elapsed = time.perf_counter() - start
+heavy = [name for name in json.loads(sys.argv[2]) if name in sys.modules and name not in preloaded]
+print(json.dumps({'seconds': elapsed, 'heavy': heavy}))
+"""
+
+
+def pages():
+    """Return the paths of the app's scripts, relative to the repository root."""
+    scripts = glob.glob(os.path.join(REPO, 'pages', '*.py'))
+    return ['Dashboard.py'] + sorted(os.path.relpath(path, REPO) for path in scripts)
+
+
+def top_level_imports(path):
+    """Return the source of the import statements at the top level of `path`."""
+    with open(os.path.join(REPO, path), encoding='utf-8') as file:
+        tree = ast.parse(file.read(), path)
+    return '\n'.join(ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom)))
+
+
+def measure(path):
+    result = subprocess.run([sys.executable, '-c', _MEASURE, top_level_imports(path), json.dumps(HEAVY_MODULES)],
+                            capture_output=True, text=True, check=True, cwd=REPO)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def check(path, repeat=3):
+    """Return the best import time of `path` over `repeat` runs, its budget and the heavy modules it imports."""
+    runs = [measure(path) for _ in range(repeat)]
+    seconds = min(run['seconds'] for run in runs)
+    heavy = runs[0]['heavy']
+    budget = BUDGETS.get(path, DEFAULT_BUDGET)
+    return {'seconds': seconds, 'budget': budget, 'heavy': heavy, 'over': seconds > budget or bool(heavy)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    failed = False
+    print(f"{'page':<40} {'import':>9} {'budget':>8}  heavy modules")
+    for path in pages():
+        result = check(path, args.repeat)
+        failed |= result['over']
+        print(f"{path:<40} {result['seconds'] * 1000:>7.0f}ms {result['budget'] * 1000:>6.0f}ms  "
+              f"{', '.join(result['heavy']) or '-'}{'  OVER BUDGET' if result['over'] else ''}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Data load, feature encoding, prediction and SHAP at multiples of the dataset size.
+
+At scale k the dataset is repeated k times. Each stage is timed on its own:
+    load     reading the model's source columns from a Feather snapshot
+    encode   building the feature matrix (`InferencePipeline.features`)
+    predict  sklearn's predict_proba and the flattened tree evaluator
+    shap     SHAP values of `SHAP_ROWS` x k rows (the explainer is built beforehand)
+
+Run from the directory holding the dataset (usually the repository root):
+    python benchmarks/inference_path.py [--scales 1 10 100] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from common import measure  # noqa: E402
+from glucoguard.data import _read, load_dataset, write_snapshot  # noqa: E402
+from glucoguard.explain import load_explainer  # noqa: E402
+from glucoguard.features import SOURCE_COLUMNS  # noqa: E402
+from glucoguard.inference import load_pipeline  # noqa: E402
+from glucoguard.trees import load_forest  # noqa: E402
+
+SCALES = [1, 10, 100]
+SHAP_ROWS = 100
+
+
+def run(scales=SCALES, repeat=3):
+    pipeline = load_pipeline()
+    forest = load_forest(pipeline)
+    explainer = load_explainer(pipeline).explainer
+    base = load_dataset(columns=SOURCE_COLUMNS)
+
+    results = {}
+    for scale in scales:
+        # Large scales are slow enough that a single run is representative
+        runs = repeat if scale < 10 else 1
+        df = pd.concat([base] * scale, ignore_index=True)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'dataset.feather')
+            write_snapshot(df, path)
+            # The uncached reader, so every run parses the file again
+            results[f"inference/load/{scale}x"] = measure(lambda: _read(path, SOURCE_COLUMNS), runs)
+
+        results[f"inference/encode/{scale}x"] = measure(lambda: pipeline.features(df), runs)
+        features = pipeline.features(df).to_numpy(dtype=np.float64)
+        del df
+        results[f"inference/predict_sklearn/{scale}x"] = measure(lambda: pipeline.predict_proba(features), runs)
+        results[f"inference/predict_flat/{scale}x"] = measure(lambda: forest.predict_proba(features), runs)
+
+        rows = pipeline.transform(features[:SHAP_ROWS * scale])
+        del features
+        results[f"inference/shap/{scale}x"] = measure(lambda: explainer.shap_values(rows), runs)
+        for stage in ('load', 'encode', 'predict_sklearn', 'predict_flat', 'shap'):
+            results[f"inference/{stage}/{scale}x"]['rows'] = len(base) * scale if stage != 'shap' else len(rows)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for name, result in run(args.scales, args.repeat).items():
+        print(json.dumps({name: result}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Rerun latency and peak memory of the dashboard pages, run headlessly with AppTest.
+
+Every page is benchmarked in its own process, so results do not depend on
+which pages ran before. The page is run once cold (empty process caches,
+figure cache as found on disk). Once the library preloading it starts has
+finished, it is rerun `--repeat` times, then every interaction of
+`INTERACTIONS` is applied and rerun `--repeat` times. Timings include AppTest's own overhead,
+which is the same for every run. Peak memory is measured under tracemalloc
+after an untraced warm-up run, as the smallest of up to three traced runs.
+
+Run from the directory holding the dataset (usually the repository root):
+    python benchmarks/page_reruns.py [--repeat 5] [--pages 1_Data_Summary]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+
+REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, REPO)
+
+from common import measure  # noqa: E402
+
+PAGES = ['Dashboard.py', 'pages/1_Data_Summary_📈.py', 'pages/2_Data_Investigation_🔎.py',
+         'pages/3_Readmission_Prediction_🛌.py', 'pages/4_Patient_History_📋.py', 'pages/5_About_❔.py']
+
+
+def _widget(widgets, label):
+    return next(widget for widget in widgets if widget.label == label)
+
+
+def _select_each(label, name, by_position=False):
+    """One interaction per option of the selectbox labelled `label`, named `name=<option>`.
+
+    Options that depend on the data are named by position instead
+    (`name=0`, `name=1`, ...), so the names still match the baseline after
+    the data changes.
+    """
+    def interactions(app):
+        def select(app, option):
+            return _widget(app.selectbox, label).set_value(option)
+        options = _widget(app.selectbox, label).options
+        return {f"{name}={i if by_position else option}": lambda app, option=option: select(app, option)
+                for i, option in enumerate(options)}
+    return interactions
+
+
+def _check(label):
+    return lambda app: {label: lambda app: _widget(app.checkbox, label).check()}
+
+
+def _click(label):
+    return lambda app: {label: lambda app: _widget(app.button, label).click()}
+
+
+# Representative widget interactions of every page, built from the page's first run
+INTERACTIONS = {
+    'pages/1_Data_Summary_📈.py': [_select_each('Select the plot you want to display:', 'plot_option'),
+                                   _select_each('', 'selected_display_col')],
+    'pages/2_Data_Investigation_🔎.py': [_check('Select All Features'), _check('Select All'),
+                                         _select_each('Diagnosis position:', 'diagnosis_position')],
+    'pages/3_Readmission_Prediction_🛌.py': [_click('Predict Readmission')],
+    'pages/4_Patient_History_📋.py': [_select_each('Patients with the most encounters:', 'patient', by_position=True)],
+}
+
+
+def page_name(path):
+    """'pages/1_Data_Summary_📈.py' -> '1_Data_Summary' (the emoji suffix is dropped)."""
+    return re.sub(r'_[^\w]+$', '', os.path.splitext(os.path.basename(path))[0])
+
+
+def _run(app):
+    app.run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+
+
+def benchmark_page(path, repeat):
+    """Return {name: result} for the cold run, plain reruns and interactions of one page."""
+    from streamlit.testing.v1 import AppTest
+
+    from glucoguard import warmup
+
+    name = page_name(path)
+    app = AppTest.from_file(os.path.join(REPO, path), default_timeout=600)
+    start = time.perf_counter()
+    _run(app)
+    results = {f"page/{name}/cold": {'seconds': time.perf_counter() - start, 'repeat': 1}}
+    # The preloading thread started by the page would compete with (and allocate during) the reruns
+    warmup.wait()
+    results[f"page/{name}/rerun"] = measure(lambda: _run(app), repeat)
+
+    for build in INTERACTIONS.get(path, []):
+        for label, interact in build(app).items():
+            def step():
+                interact(app)
+                _run(app)
+            results[f"page/{name}/{label}"] = measure(step, repeat)
+    return results
+
+
+def run(repeat=5, pages=None):
+    """Benchmark `pages` (all pages by default, or those whose name contains one of `pages`)."""
+    results = {}
+    for path in PAGES:
+        if pages and not any(part in path for part in pages):
+            continue
+        output = subprocess.run([sys.executable, __file__, '--single', path, '--repeat', str(repeat)],
+                                capture_output=True, text=True, check=True).stdout
+        results.update(json.loads(output.splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--pages', nargs='+', default=None, help="substrings of the page paths to run")
+    parser.add_argument('--single', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        # Child process of `run`: one page, results as a single JSON line
+        print(json.dumps(benchmark_page(args.single, args.repeat), ensure_ascii=False))
+        return
+    for name, result in run(args.repeat, args.pages).items():
+        print(json.dumps({name: result}, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
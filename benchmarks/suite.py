@@ -0,0 +1,151 @@
+"""Run the benchmark suite, store the results as JSON and flag regressions against a baseline.
+
+Suites:
+    imports    top-level import time of every page (see import_time.py)
+    pages      rerun latency and peak memory of page interactions (see page_reruns.py)
+    inference  data load, encoding, prediction and SHAP at 1x/10x/100x (see inference_path.py)
+
+A result regresses when its best time (or peak memory) exceeds the baseline's
+by more than `--tolerance` and by more than a small absolute margin, so that
+millisecond-level noise is not reported. The exit status is 1 when anything
+regressed, or when a page is over its import budget or imports a heavy
+module (the checks of import_time.py, which need no baseline). Runs of fewer
+than `MIN_REPEAT` repeats are too noisy to compare and are not checked against
+the baseline (nor is a baseline recorded with fewer). Results without a baseline entry are listed, not skipped silently.
+
+Run from the directory holding the dataset (usually the repository root):
+    python benchmarks/suite.py --save-baseline         # record benchmarks/baseline.json
+    python benchmarks/suite.py                         # compare with it
+    python benchmarks/suite.py --suites pages --pages 3_Readmission
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+from datetime import datetime, timezone
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..'))
+
+import import_time  # noqa: E402
+import inference_path  # noqa: E402
+import page_reruns  # noqa: E402
+
+SUITES = ['imports', 'pages', 'inference']
+BASELINE_PATH = os.path.join(BENCHMARKS, 'baseline.json')
+OUTPUT_PATH = "benchmark_results.json"
+TOLERANCE = 0.25
+# Differences below these are noise, whatever the relative change (AppTest reruns of
+# identical pages vary by about 20 ms on a busy machine)
+MIN_SECONDS = 0.025
+MIN_MB = 1.0
+# Fewest repeats whose results are compared with the baseline
+MIN_REPEAT = 3
+
+
+def run(suites, repeat, scales, pages):
+    results = {}
+    if 'imports' in suites:
+        for path in import_time.pages():
+            result = import_time.check(path, repeat)
+            results[f"imports/{page_reruns.page_name(path)}"] = {
+                'seconds': result['seconds'], 'repeat': repeat, 'budget': result['budget'], 'heavy': result['heavy']}
+    if 'pages' in suites:
+        results.update(page_reruns.run(repeat, pages))
+    if 'inference' in suites:
+        results.update(inference_path.run(scales, repeat))
+    return results
+
+
+def over_budget(results):
+    """Return the import results over their budget or importing a heavy module."""
+    return {name: result for name, result in results.items()
+            if 'budget' in result and (result['seconds'] > result['budget'] or result['heavy'])}
+
+
+def regressions(results, baseline, tolerance=TOLERANCE):
+    """Return (name, metric, baseline value, value) for every result worse than the baseline."""
+    found = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for metric, margin in (('seconds', MIN_SECONDS), ('peak_mb', MIN_MB)):
+            if metric not in result or metric not in reference:
+                continue
+            value, expected = result[metric], reference[metric]
+            if value > expected * (1 + tolerance) and value - expected > margin:
+                found.append((name, metric, expected, value))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--suites', nargs='+', choices=SUITES, default=SUITES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--scales', type=int, nargs='+', default=inference_path.SCALES)
+    parser.add_argument('--pages', nargs='+', default=None, help="substrings of the page paths to run")
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'cpus': os.cpu_count(),
+        'repeat': args.repeat,
+        'results': run(args.suites, args.repeat, args.scales, args.pages),
+    }
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=1, ensure_ascii=False)
+    print(f"Wrote {len(report['results'])} results to {args.output}")
+    over = over_budget(report['results'])
+    for name, result in over.items():
+        print(f"OVER BUDGET {name}: {result['seconds'] * 1000:.0f}ms (budget {result['budget'] * 1000:.0f}ms), "
+              f"heavy modules: {', '.join(result['heavy']) or '-'}")
+
+    if args.save_baseline:
+        if args.repeat < MIN_REPEAT:
+            print(f"WARNING: a baseline of fewer than {MIN_REPEAT} repeats will not be compared against")
+        with open(args.baseline, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=1, ensure_ascii=False)
+        print(f"Saved the baseline to {args.baseline}")
+        sys.exit(1 if over else 0)
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        sys.exit(1 if over else 0)
+
+    with open(args.baseline, encoding='utf-8') as file:
+        baseline = json.load(file)
+    print(f"Baseline from {baseline['created']} ({baseline['machine']})")
+    # Baselines recorded before the repeat count was stored are trusted
+    repeats = min(args.repeat, baseline.get('repeat', MIN_REPEAT))
+    if repeats < MIN_REPEAT:
+        print(f"Not compared with the baseline: runs of fewer than {MIN_REPEAT} repeats are too noisy "
+              f"(this run: {args.repeat}, baseline: {baseline.get('repeat', 'unknown')})")
+        sys.exit(1 if over else 0)
+    missing = [name for name in report['results'] if name not in baseline['results']]
+    if missing:
+        print(f"No baseline for {len(missing)} results (record a new one with --save-baseline): "
+              + ', '.join(missing))
+    print(f"{'benchmark':<60} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in report['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is not None:
+            change = result['seconds'] / reference['seconds'] - 1 if reference['seconds'] else 0.0
+            print(f"{name:<60} {reference['seconds'] * 1000:>8.1f}ms {result['seconds'] * 1000:>8.1f}ms "
+                  f"{change:>+7.0%}")
+
+    found = regressions(report['results'], baseline['results'], args.tolerance)
+    for name, metric, expected, value in found:
+        unit = 'MiB' if metric == 'peak_mb' else 's'
+        print(f"REGRESSION {name}: {metric} {expected:.3f}{unit} -> {value:.3f}{unit}")
+    sys.exit(1 if found or over else 0)
+
+
+if __name__ == '__main__':
+    main()
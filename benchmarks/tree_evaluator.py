@@ -0,0 +1,73 @@
+"""Compare the flattened tree evaluator with sklearn's predict_proba.
+
+Besides the timings, the predictions are checked against sklearn's on rows
+with missing values (in feature 0, which leaves also store as their
+feature, and at random in every feature); the exit status is 1 when they
+differ.
+
+Run from the repository root:
+    python benchmarks/tree_evaluator.py [--repeat 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from glucoguard.data import load_dataset  # noqa: E402
+from glucoguard.features import SOURCE_COLUMNS  # noqa: E402
+from glucoguard.inference import load_pipeline  # noqa: E402
+from glucoguard.trees import flatten  # noqa: E402
+
+BATCH_SIZES = [1, 100, 100_000]
+# Largest difference from sklearn's probabilities that is rounding
+TOLERANCE = 1e-9
+
+
+def best_time(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    pipeline = load_pipeline()
+    forest = flatten(pipeline.model, pipeline.scaler)
+    features = pipeline.features(load_dataset(columns=SOURCE_COLUMNS)).to_numpy(dtype=np.float64)
+    features = np.resize(features, (max(BATCH_SIZES), features.shape[1]))
+
+    print(f"{'rows':>8} {'sklearn':>12} {'flattened':>12} {'speed-up':>9} {'max |diff|':>11}")
+    for size in BATCH_SIZES:
+        batch = features[:size]
+        repeat = args.repeat if size < 10_000 else max(3, args.repeat // 5)
+        expected = pipeline.predict_proba(batch)
+        diff = np.abs(forest.predict_proba(batch) - expected).max()
+        sklearn_time = best_time(lambda: pipeline.predict_proba(batch), repeat)
+        flat_time = best_time(lambda: forest.predict_proba(batch), repeat)
+        print(f"{size:>8} {sklearn_time * 1000:>10.3f}ms {flat_time * 1000:>10.3f}ms "
+              f"{sklearn_time / flat_time:>8.1f}x {diff:>11.2e}")
+
+    batch = features[:10_000].copy()
+    first_feature = batch.copy()
+    first_feature[::2, 0] = np.nan
+    batch[np.random.default_rng(0).random(batch.shape) < 0.1] = np.nan
+    failed = False
+    for name, rows in (('NaN in feature 0', first_feature), ('NaN anywhere', batch)):
+        diff = np.abs(forest.predict_proba(rows) - pipeline.predict_proba(rows)).max()
+        failed |= not diff <= TOLERANCE
+        print(f"{name:<17} max |diff| {diff:.2e}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1 @@
+"""Shared building blocks used by the GlucoGuard dashboard pages and notebooks."""
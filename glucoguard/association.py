@@ -0,0 +1,109 @@
+"""Chi-square tests of every categorical column against readmission.
+
+The contingency tables of all features are built together: each column is
+reduced to integer codes, offset into its own block of cells and counted with
+a single `np.bincount`. The statistics are then computed for all tables at
+once on a zero-padded (features x categories x classes) array.
+"""
+import numpy as np
+import pandas as pd
+
+from glucoguard.data import cached, dataset_version
+from glucoguard.schema import MEDICATIONS
+
+CATEGORICAL_FEATURES = ['race', 'gender', 'age', 'admission_type_id', 'discharge_disposition_id',
+                        'admission_source_id', 'diag_1', 'diag_2', 'diag_3'] + MEDICATIONS + \
+                       ['change', 'diabetesMed', 'max_glu_serum_transformed', 'A1Cresult_transformed']
+
+
+def _codes(column):
+    """Return integer codes (-1 when missing) and the number of categories of `column`."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        return column.cat.codes.to_numpy(dtype=np.int64), len(column.cat.categories)
+    codes, uniques = pd.factorize(column, sort=True)
+    return codes.astype(np.int64), len(uniques)
+
+
+def contingency_tables(df, features, target):
+    """Return one (categories x classes) count table per feature, in a single bincount.
+
+    `target` is a Series of class labels aligned with `df`. Rows where the
+    feature (or the target) is missing are left out of that feature's table.
+    """
+    target_codes, n_classes = _codes(target)
+    sizes, blocks = [], []
+    offset = 0
+    for feature in features:
+        codes, n_categories = _codes(df[feature])
+        valid = (codes >= 0) & (target_codes >= 0)
+        # Invalid rows are counted in a trash cell at index -1 of the output
+        blocks.append(np.where(valid, offset + codes * n_classes + target_codes, -1))
+        sizes.append(n_categories)
+        offset += n_categories * n_classes
+
+    cells = np.concatenate(blocks)
+    counts = np.bincount(cells + 1, minlength=offset + 1)[1:]
+    tables, start = {}, 0
+    for feature, n_categories in zip(features, sizes):
+        tables[feature] = counts[start:start + n_categories * n_classes].reshape(n_categories, n_classes)
+        start += n_categories * n_classes
+    return tables
+
+
+def chi_square(tables, correction=True):
+    """Chi-square statistic, p-value, degrees of freedom and Cramér's V of every table.
+
+    Empty rows and columns are ignored. Like `scipy.stats.chi2_contingency`,
+    Yates' continuity correction is applied to tables with one degree of
+    freedom when `correction` is true; Cramér's V is computed from the
+    uncorrected statistic.
+    """
+    from scipy.stats import chi2
+
+    names = list(tables)
+    n_rows = max(table.shape[0] for table in tables.values())
+    n_cols = max(table.shape[1] for table in tables.values())
+    observed = np.zeros((len(names), n_rows, n_cols), dtype=np.float64)
+    for i, name in enumerate(names):
+        table = tables[name]
+        observed[i, :table.shape[0], :table.shape[1]] = table
+
+    row_sums = observed.sum(axis=2, keepdims=True)
+    col_sums = observed.sum(axis=1, keepdims=True)
+    total = observed.sum(axis=(1, 2), keepdims=True)
+    expected = row_sums * col_sums / np.where(total > 0, total, 1)
+    dof = ((row_sums[:, :, 0] > 0).sum(axis=1) - 1) * ((col_sums[:, 0, :] > 0).sum(axis=1) - 1)
+
+    diff = observed - expected
+    with np.errstate(divide='ignore', invalid='ignore'):
+        terms = np.where(expected > 0, diff ** 2 / expected, 0.0)
+        statistic = terms.sum(axis=(1, 2))
+        if correction:
+            corrected = np.abs(diff) - np.minimum(0.5, np.abs(diff))
+            corrected_terms = np.where(expected > 0, corrected ** 2 / expected, 0.0)
+            statistic = np.where(dof == 1, corrected_terms.sum(axis=(1, 2)), statistic)
+        n = total[:, 0, 0]
+        min_dim = np.minimum((row_sums[:, :, 0] > 0).sum(axis=1), (col_sums[:, 0, :] > 0).sum(axis=1)) - 1
+        cramers_v = np.sqrt(terms.sum(axis=(1, 2)) / (n * min_dim))
+
+    return pd.DataFrame({
+        'chi2': np.where(dof > 0, statistic, np.nan),
+        'p_value': np.where(dof > 0, chi2.sf(statistic, np.maximum(dof, 1)), np.nan),
+        'dof': dof,
+        'cramers_v': np.where(dof > 0, cramers_v, np.nan),
+        'n': n.astype(np.int64),
+    }, index=pd.Index(names, name='feature'))
+
+
+def readmission_associations(df, features=CATEGORICAL_FEATURES):
+    """Chi-square results of `features` against readmission (readmitted or not)."""
+    readmitted = pd.Series(np.where(df['readmitted'] == 'NO', 'No', 'Yes'), index=df.index)
+    return chi_square(contingency_tables(df, features, readmitted))
+
+
+def load_readmission_associations(path=None):
+    """Return `readmission_associations` for the whole dataset, computed once per dataset version."""
+    from glucoguard.query import backend
+
+    return cached(('readmission_associations', path), dataset_version(path),
+                  lambda: backend(path).readmission_associations(CATEGORICAL_FEATURES))
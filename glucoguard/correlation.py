@@ -0,0 +1,136 @@
+"""Pearson correlations of the numeric features from sufficient statistics.
+
+The statistics are the number of encounters n, the column sums Σx and the
+cross-product matrix Σxy (whose diagonal is Σx²) of the numeric features,
+with the binary features encoded as 0/1 and age as the midpoint of its bin.
+Any correlation matrix is derived from them without touching the rows, and
+newly appended encounters are added in O(new rows).
+
+Usage:
+    python -m glucoguard.correlation build
+    python -m glucoguard.correlation append new_encounters.csv
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from glucoguard.data import artifact_source, artifact_version, cached, dataset_version, file_version, load_dataset
+from glucoguard.medications import medication_bits, uses
+from glucoguard.schema import AGE_MIDPOINTS, MEDICATIONS
+
+STATS_PATH = "diabetes_correlation.npz"
+
+# Numeric (or binarized) features, in the order shown on the Data Investigation page
+FEATURES = ['age', 'gender', 'time_in_hospital', 'num_lab_procedures', 'num_medications',
+            'number_outpatient', 'number_emergency', 'number_inpatient', 'change',
+            'readmitted', 'metformin', 'insulin']
+
+# The medication features are read from the medication bitmask, built from all 23 columns
+MEDICATION_FEATURES = ['metformin', 'insulin']
+SOURCE_COLUMNS = [col for col in FEATURES if col not in MEDICATION_FEATURES] + MEDICATIONS
+
+
+def encode(df):
+    """Return the (encounters x FEATURES) float64 matrix of `df`."""
+    bits = medication_bits(df)
+    columns = {
+        'age': df['age'].map(AGE_MIDPOINTS).to_numpy(dtype=np.float64),
+        'gender': (df['gender'] == 'Male').to_numpy(),
+        'change': (df['change'] != 'No').to_numpy(),
+        'readmitted': (df['readmitted'] != 'NO').to_numpy(),
+        **{med: uses(bits, med) for med in MEDICATION_FEATURES},
+    }
+    return np.column_stack([columns[col] if col in columns else df[col].to_numpy()
+                            for col in FEATURES]).astype(np.float64)
+
+
+class CorrelationStats:
+    """Sufficient statistics (n, Σx, Σxy) of the numeric features."""
+
+    def __init__(self, n=0, sums=None, cross=None):
+        k = len(FEATURES)
+        self.n = int(n)
+        self.sums = np.zeros(k) if sums is None else np.asarray(sums, dtype=np.float64)
+        self.cross = np.zeros((k, k)) if cross is None else np.asarray(cross, dtype=np.float64)
+
+    @classmethod
+    def from_frame(cls, df):
+        X = encode(df)
+        return cls(len(X), X.sum(axis=0), X.T @ X)
+
+    def __add__(self, other):
+        return CorrelationStats(self.n + other.n, self.sums + other.sums, self.cross + other.cross)
+
+    def update(self, new_rows):
+        """Return the statistics with newly appended encounters added."""
+        return self + CorrelationStats.from_frame(new_rows)
+
+    def corr(self, columns=None):
+        """Return the Pearson correlation matrix of `columns` (all features by default)."""
+        columns = FEATURES if columns is None else list(columns)
+        idx = [FEATURES.index(col) for col in columns]
+        sums = self.sums[idx]
+        cov = self.cross[np.ix_(idx, idx)] - np.outer(sums, sums) / self.n
+        std = np.sqrt(np.clip(np.diag(cov), 0, None))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cov / np.outer(std, std)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return pd.DataFrame(corr, index=columns, columns=columns)
+
+    def save(self, path=STATS_PATH):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, n=self.n, sums=self.sums, cross=self.cross)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=STATS_PATH):
+        with np.load(path) as arrays:
+            return cls(arrays['n'], arrays['sums'], arrays['cross'])
+
+
+def stats_version(path=STATS_PATH):
+    """Return a token that changes whenever the statistics `load_stats` returns change."""
+    return artifact_version(path)
+
+
+def load_stats(path=STATS_PATH):
+    """Return the statistics, shared by every session of the process.
+
+    The offline-built file is used unless the dataset has been rewritten
+    after it, in which case the statistics are computed from the dataset by
+    the query backend (see `glucoguard.query`).
+    """
+    from glucoguard.query import backend
+
+    source = artifact_source(path)
+    if source == path:
+        return cached(('correlation', os.path.abspath(path)), file_version(path),
+                      lambda: CorrelationStats.load(path))
+    return cached(('correlation', os.path.abspath(source)), dataset_version(source),
+                  lambda: backend(source).correlation_stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the correlation statistics.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="compute the statistics from the clean dataset")
+    build.add_argument('--data', default=None, help="clean dataset (CSV or Feather)")
+    append = subparsers.add_parser('append', help="add newly arrived encounters to the statistics")
+    append.add_argument('new_rows', help="new encounters in the clean dataset schema (CSV or Feather)")
+    parser.add_argument('--stats', default=STATS_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        from glucoguard.query import backend
+
+        stats = backend(args.data).correlation_stats()
+    else:
+        stats = CorrelationStats.load(args.stats).update(load_dataset(columns=SOURCE_COLUMNS, path=args.new_rows))
+    stats.save(args.stats)
+    print(f"{args.stats}: {stats.n} encounters")
+
+
+if __name__ == '__main__':
+    main()
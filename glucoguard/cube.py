@@ -0,0 +1,146 @@
+"""Precomputed aggregate cube behind the Data Summary page.
+
+The cube holds one row per observed combination of the summary dimensions
+(demographics, readmission, medication change and pharmacological group
+usage) with the number of encounters and the sum and sum of squares of the
+time in hospital. Every chart on the page is a roll-up of these rows, so
+its cost depends on the number of cells, not on the number of encounters.
+
+Usage:
+    python -m glucoguard.cube build
+    python -m glucoguard.cube append new_encounters.csv
+"""
+import argparse
+import os
+
+import pandas as pd
+
+from glucoguard.data import (apply_dtypes, artifact_source, artifact_version, cached,
+                             dataset_version, file_version, load_dataset)
+from glucoguard.medications import medication_bits, medication_flags
+from glucoguard.schema import MEDICATIONS, PHARM_GROUPS
+
+CUBE_PATH = "diabetes_cube.feather"
+
+DIMENSIONS = ['age', 'race', 'gender', 'readmitted', 'change'] + PHARM_GROUPS
+MEASURES = ['count', 'time_in_hospital_sum', 'time_in_hospital_sumsq']
+
+# Columns of the clean dataset needed to build the cube
+SOURCE_COLUMNS = ['age', 'race', 'gender', 'readmitted', 'change', 'time_in_hospital'] + MEDICATIONS
+
+
+def _aggregate(frame):
+    return frame.groupby(DIMENSIONS, observed=True, sort=False)[MEASURES].sum().reset_index()
+
+
+def build_cube(df):
+    """Aggregate encounters in the clean dataset schema into a cube."""
+    time = df['time_in_hospital'].astype('int64')
+    flags = medication_flags(medication_bits(df), PHARM_GROUPS, index=df.index)
+    frame = pd.concat([df[DIMENSIONS[:5]], flags], axis=1).assign(
+        count=1,
+        time_in_hospital_sum=time,
+        time_in_hospital_sumsq=time * time,
+    )
+    return _aggregate(frame)
+
+
+def update_cube(cube, new_rows):
+    """Return `cube` updated with newly appended encounters, without rescanning old ones."""
+    combined = pd.concat([cube, build_cube(new_rows)], ignore_index=True)
+    return _aggregate(apply_dtypes(combined))
+
+
+def write_cube(cube, path=CUBE_PATH):
+    tmp_path = f"{path}.tmp"
+    cube.to_feather(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_cube(path=CUBE_PATH):
+    return apply_dtypes(pd.read_feather(path))
+
+
+def cube_version(path=CUBE_PATH):
+    """Return a token that changes whenever the cube `load_cube` returns changes."""
+    return artifact_version(path)
+
+
+def load_cube(path=CUBE_PATH):
+    """Return the cube, shared by every session of the process.
+
+    The offline-built cube file is used unless the dataset has been rewritten
+    after it, in which case the cube is rebuilt from the dataset by the query
+    backend (see `glucoguard.query`).
+    """
+    from glucoguard.query import backend
+
+    source = artifact_source(path)
+    if source == path:
+        return cached(('cube', os.path.abspath(path)), file_version(path), lambda: read_cube(path))
+    return cached(('cube', os.path.abspath(source)), dataset_version(source),
+                  lambda: backend(source).cube())
+
+
+def value_counts(cube, dim):
+    """Number of encounters per value of `dim`, largest first."""
+    return cube.groupby(dim, observed=True)['count'].sum().sort_values(ascending=False)
+
+
+def mean(cube, by, measure='time_in_hospital'):
+    """Mean of `measure` per value of `by`."""
+    sums = cube.groupby(by, observed=True)[['count', f'{measure}_sum']].sum()
+    return sums[f'{measure}_sum'] / sums['count']
+
+
+def std(cube, by, measure='time_in_hospital'):
+    """Sample standard deviation of `measure` per value of `by`."""
+    sums = cube.groupby(by, observed=True)[['count', f'{measure}_sum', f'{measure}_sumsq']].sum()
+    n = sums['count']
+    variance = (sums[f'{measure}_sumsq'] - sums[f'{measure}_sum'] ** 2 / n) / (n - 1)
+    return variance.clip(lower=0) ** 0.5
+
+
+def proportions(cube, by, of):
+    """Share of each value of `of` within each value of `by` (rows sum to 1)."""
+    counts = cube.groupby([by, of], observed=True)['count'].sum().unstack(fill_value=0)
+    return counts.div(counts.sum(axis=1), axis=0)
+
+
+def group_counts(cube, by):
+    """Encounter counts per pharmacological group and the `by` dimensions.
+
+    An encounter is counted once for every group it received, like the long
+    (melted) frame the page used to build from the raw rows.
+    """
+    parts = []
+    for group in PHARM_GROUPS:
+        used = cube[cube[group] == 1]
+        part = used.groupby(by, observed=True)['count'].sum().reset_index()
+        part.insert(0, 'Pharmacological Group', group)
+        parts.append(part)
+    return pd.concat(parts, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or update the Data Summary aggregate cube.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="build the cube from the clean dataset")
+    build.add_argument('--data', default=None, help="clean dataset (CSV or Feather)")
+    append = subparsers.add_parser('append', help="add newly arrived encounters to the cube")
+    append.add_argument('new_rows', help="new encounters in the clean dataset schema (CSV or Feather)")
+    parser.add_argument('--cube', default=CUBE_PATH)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        from glucoguard.query import backend
+
+        cube = backend(args.data).cube()
+    else:
+        cube = update_cube(read_cube(args.cube), load_dataset(columns=SOURCE_COLUMNS, path=args.new_rows))
+    write_cube(cube, args.cube)
+    print(f"{args.cube}: {len(cube)} cells, {cube['count'].sum()} encounters")
+
+
+if __name__ == '__main__':
+    main()
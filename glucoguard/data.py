@@ -0,0 +1,189 @@
+"""Process-wide access to the clean diabetes dataset.
+
+Every dashboard page reads the dataset through `load_dataset()`. The file is
+parsed once per server process and the same frame is handed to every session
+until the file on disk changes, at which point it is transparently reloaded.
+
+The preprocessing notebook writes the dataset twice: as `diabetes_clean.csv`
+and as an uncompressed Feather (Arrow IPC) snapshot that keeps the column
+dtypes, including the ordered categories. The snapshot is memory-mapped and
+only the requested columns are materialised, so it is preferred when present.
+The `GLUCOGUARD_DATASET` environment variable points the dashboard at another
+dataset file (CSV or Feather), for example synthetic encounters.
+"""
+import os
+import threading
+
+import pandas as pd
+
+from glucoguard.schema import NOMINAL_COLUMNS, ORDINAL_CATEGORIES
+
+# Paths of the dataset written by `1_Preprocessing.ipynb`
+DATA_PATH = "diabetes_clean.csv"
+SNAPSHOT_PATH = "diabetes_clean.feather"
+# Overrides the default dataset (see `dataset_path`)
+DATASET_ENV = 'GLUCOGUARD_DATASET'
+
+_lock = threading.Lock()
+_key_locks = {}
+_cache = {}
+
+
+def dataset_path(path=None):
+    """Return `path`, or `GLUCOGUARD_DATASET`, or the snapshot if it exists and the CSV file otherwise."""
+    if path is not None:
+        return path
+    if os.environ.get(DATASET_ENV):
+        return os.environ[DATASET_ENV]
+    return SNAPSHOT_PATH if os.path.exists(SNAPSHOT_PATH) else DATA_PATH
+
+
+def _dtypes():
+    dtypes = {col: 'category' for col in NOMINAL_COLUMNS}
+    for col, order in ORDINAL_CATEGORIES.items():
+        dtypes[col] = pd.CategoricalDtype(order, ordered=True)
+    return dtypes
+
+
+def apply_dtypes(df):
+    """Return `df` with the categorical dtypes assigned by the preprocessing notebook."""
+    dtypes = {col: dtype for col, dtype in _dtypes().items()
+              if col in df.columns and df[col].dtype != dtype}
+    return df.astype(dtypes) if dtypes else df
+
+
+def file_version(path):
+    """Return a token that changes whenever the file at `path` changes."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def dataset_version(path=None):
+    """Return a token that changes whenever the dataset file changes."""
+    return file_version(dataset_path(path))
+
+
+def artifact_source(path):
+    """Return `path` if that offline artifact is at least as new as the dataset, else the dataset's path.
+
+    The cube, the correlation statistics and the patient index are read from
+    their file while it is current and rebuilt from the dataset once it is stale.
+    """
+    data_path = dataset_path()
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(data_path):
+        return path
+    return data_path
+
+
+def artifact_version(path):
+    """Return a token that changes whenever the source `artifact_source` picks for `path` changes."""
+    source = artifact_source(path)
+    return f"{os.path.basename(source)}-{file_version(source)}"
+
+
+def write_snapshot(df, path=SNAPSHOT_PATH):
+    """Write `df` as a typed, uncompressed Feather snapshot that can be memory-mapped."""
+    import pyarrow as pa
+    from pyarrow import feather
+
+    table = pa.Table.from_pandas(apply_dtypes(df), preserve_index=False)
+    feather.write_feather(table, path, compression='uncompressed')
+
+
+class SnapshotWriter:
+    """Write a Feather snapshot incrementally, one frame at a time.
+
+    An Arrow IPC file cannot change a column's dictionary between batches, so
+    only the ordered columns, whose categories are fixed, are written as
+    dictionaries. The other nominal columns are stored as strings and turned
+    back into categoricals by `load_dataset()`.
+
+    Batches go to a temporary file that replaces `path` on `close()`, so
+    readers never see a half-written snapshot.
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH):
+        self.path = path
+        self._tmp_path = f"{path}.tmp"
+        self._schema = None
+        self._writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+
+        dtypes = {col: object for col in NOMINAL_COLUMNS if col in df.columns}
+        for col, order in ORDINAL_CATEGORIES.items():
+            if col in df.columns:
+                dtypes[col] = pd.CategoricalDtype(order, ordered=True)
+        df = df.astype(dtypes)
+        if self._writer is None:
+            self._schema = pa.Schema.from_pandas(df, preserve_index=False)
+            self._writer = pa.ipc.new_file(self._tmp_path, self._schema)
+        self._writer.write_table(pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Discard everything written so far."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _read(path, columns):
+    if path.endswith('.feather'):
+        from pyarrow import feather
+
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        return apply_dtypes(table.to_pandas())
+    dtypes = _dtypes()
+    if columns is not None:
+        dtypes = {col: dtype for col, dtype in dtypes.items() if col in columns}
+    return pd.read_csv(path, usecols=columns, dtype=dtypes)
+
+
+def cached(key, version, build):
+    """Return `build()`, computed at most once per `version` of `key` in this process.
+
+    Only the latest version of each key is kept. Concurrent callers asking for
+    the same key wait for the first one instead of repeating the work.
+    """
+    with _lock:
+        key_lock = _key_locks.setdefault(key, threading.Lock())
+    with key_lock:
+        entry = _cache.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        value = build()
+        _cache[key] = (version, value)
+        return value
+
+
+def load_dataset(columns=None, path=None):
+    """Return the dataset, reading each file version at most once per column set.
+
+    `columns` restricts the frame to the listed columns, so pages only pay for
+    what they use. By default the Feather snapshot is read when it exists,
+    falling back to the CSV file.
+
+    The returned frame is shared by every session of the server, so callers
+    must treat it as read-only and take a `.copy()` before modifying it.
+    """
+    path = dataset_path(path)
+    columns = None if columns is None else tuple(columns)
+    return cached(('dataset', os.path.abspath(path), columns), dataset_version(path),
+                  lambda: _read(path, None if columns is None else list(columns)))
@@ -0,0 +1,206 @@
+"""ICD-9 diagnosis dictionary, clinical groups and an inverted index of encounters.
+
+`diag_1`, `diag_2` and `diag_3` hold ICD-9 codes as text ('250.83', '428',
+'V57', 'E909'). The dictionary gives every code seen in the dataset a dense
+int16 id (in sorted code order) and every id the clinical group of the code,
+using the grouping of the dataset's publication (Strack et al., 2014):
+circulatory, respiratory, digestive, diabetes (250.xx), injury,
+musculoskeletal, genitourinary, neoplasms and other. Once the diagnoses are
+encoded, mapping to groups is an array lookup and counting a `bincount`.
+
+The inverted index holds, for every diagnosis column (and for any of the
+three), the sorted rows of the encounters in each group, so that the
+encounters of a group are found without scanning the dataset.
+
+Usage (prints the readmission rate per group of every diagnosis column):
+    python -m glucoguard.diagnoses [--data diabetes_clean.feather]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from glucoguard.data import cached, dataset_version, load_dataset
+
+DIAGNOSIS_COLUMNS = ['diag_1', 'diag_2', 'diag_3']
+# Label of every diagnosis column on the dashboard, plus 'any' for any of the three
+POSITIONS = {'diag_1': 'Primary diagnosis', 'diag_2': 'Secondary diagnosis',
+             'diag_3': 'Additional secondary diagnosis', 'any': 'Any diagnosis'}
+
+GROUPS = ['Circulatory', 'Respiratory', 'Digestive', 'Diabetes', 'Injury', 'Musculoskeletal',
+          'Genitourinary', 'Neoplasms', 'Other']
+# ICD-9 ranges (inclusive, on the integer part of the code) of every group but 'Other' and 'Diabetes'
+GROUP_RANGES = {
+    'Circulatory': [(390, 459), (785, 785)],
+    'Respiratory': [(460, 519), (786, 786)],
+    'Digestive': [(520, 579), (787, 787)],
+    'Injury': [(800, 999)],
+    'Musculoskeletal': [(710, 739)],
+    'Genitourinary': [(580, 629), (788, 788)],
+    'Neoplasms': [(140, 239)],
+}
+
+
+def diagnosis_group(code):
+    """Return the clinical group of an ICD-9 code; supplementary V and E codes are 'Other'."""
+    if code[:1] in ('V', 'E'):
+        return 'Other'
+    number = int(float(code))
+    if number == 250:
+        return 'Diabetes'
+    for group, ranges in GROUP_RANGES.items():
+        if any(low <= number <= high for low, high in ranges):
+            return group
+    return 'Other'
+
+
+class DiagnosisDictionary:
+    """Dense int16 ids of ICD-9 codes and the group of every id."""
+
+    def __init__(self, codes):
+        codes = sorted(set(codes))
+        if len(codes) > np.iinfo(np.int16).max:
+            raise ValueError(f"{len(codes)} distinct diagnosis codes do not fit in int16 ids")
+        self.codes = pd.Index(codes, dtype=object)
+        self.groups = np.array([GROUPS.index(diagnosis_group(code)) for code in codes], dtype=np.int8)
+
+    @classmethod
+    def from_frame(cls, df, columns=DIAGNOSIS_COLUMNS):
+        """Dictionary of every code in the diagnosis `columns` of `df`."""
+        codes = set()
+        for col in columns:
+            values = df[col].cat.categories if isinstance(df[col].dtype, pd.CategoricalDtype) else df[col].unique()
+            codes.update(str(value) for value in values if pd.notna(value) and value != '?')
+        return cls(codes)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def encode(self, column):
+        """Return the int16 ids of a column of codes (-1 when missing or not in the dictionary)."""
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # One lookup per category instead of one per encounter
+            lookup = self.codes.get_indexer(column.cat.categories.astype(str))
+            codes = column.cat.codes.to_numpy()
+            return np.where(codes >= 0, lookup[codes], -1).astype(np.int16)
+        return self.codes.get_indexer(column.astype(str)).astype(np.int16)
+
+    def group_ids(self, ids):
+        """Return the group index (into `GROUPS`) of every id, -1 for -1."""
+        ids = np.asarray(ids)
+        return np.where(ids >= 0, self.groups[ids.clip(min=0)], -1).astype(np.int8)
+
+    def frequency_encode(self, column):
+        """Relative frequency of every value of a column of codes, like `value_counts(normalize=True)` + `map`."""
+        ids = self.encode(column)
+        valid = ids >= 0
+        frequencies = np.bincount(ids[valid], minlength=len(self)) / max(valid.sum(), 1)
+        return pd.Series(np.where(valid, frequencies[ids.clip(min=0)], np.nan), index=column.index,
+                         name=column.name)
+
+
+class DiagnosisIndex:
+    """Encoded diagnoses of every encounter and the sorted encounter rows of every group."""
+
+    def __init__(self, dictionary, df):
+        self.dictionary = dictionary
+        self.ids = {col: dictionary.encode(df[col]) for col in DIAGNOSIS_COLUMNS}
+        self.group_ids = {col: dictionary.group_ids(ids) for col, ids in self.ids.items()}
+        self._rows = {}
+        for col, group_ids in self.group_ids.items():
+            # Rows sorted by group (stable, so each group's rows stay sorted) and the start of every group
+            order = np.argsort(group_ids, kind='stable').astype(np.int32)
+            starts = np.searchsorted(group_ids[order], np.arange(len(GROUPS) + 1))
+            self._rows[col] = (order, starts)
+        self._any = {}
+
+    def __len__(self):
+        return len(self.ids[DIAGNOSIS_COLUMNS[0]])
+
+    def rows(self, group, column='any'):
+        """Sorted rows of the encounters with a diagnosis of `group` in `column` (or in any column)."""
+        g = GROUPS.index(group)
+        if column != 'any':
+            order, starts = self._rows[column]
+            return order[starts[g]:starts[g + 1]]
+        if group not in self._any:
+            self._any[group] = np.unique(np.concatenate([self.rows(group, col) for col in DIAGNOSIS_COLUMNS]))
+        return self._any[group]
+
+    def group_counts(self, column, weights=None):
+        """Number (or sum of `weights`) of encounters per group of `column`, in `GROUPS` order."""
+        if column == 'any':
+            rows = [self.rows(group) for group in GROUPS]
+            return np.array([len(r) if weights is None else weights[r].sum() for r in rows])
+        group_ids = self.group_ids[column]
+        valid = group_ids >= 0
+        return np.bincount(group_ids[valid], weights=None if weights is None else weights[valid],
+                           minlength=len(GROUPS))
+
+    def code_counts(self, column, rows=None, weights=None):
+        """Number (or sum of `weights`) of encounters per code of `column`, among `rows` (all by default)."""
+        ids = self.ids[column] if rows is None else self.ids[column][rows]
+        if weights is not None and rows is not None:
+            weights = weights[rows]
+        valid = ids >= 0
+        return np.bincount(ids[valid], weights=None if weights is None else weights[valid],
+                           minlength=len(self.dictionary))
+
+
+def _readmission_table(counts, readmitted, index):
+    table = pd.DataFrame({'encounters': counts.astype(np.int64), 'readmitted': readmitted.astype(np.int64)},
+                         index=index)
+    table['readmission_rate'] = table['readmitted'] / table['encounters'].where(table['encounters'] > 0)
+    return table
+
+
+def load_index(path=None):
+    """Return the inverted index (and dictionary) of the dataset's diagnoses, built once per dataset version."""
+    def build():
+        df = load_dataset(columns=DIAGNOSIS_COLUMNS, path=path)
+        return DiagnosisIndex(DiagnosisDictionary.from_frame(df), df)
+    return cached(('diagnosis_index', path), dataset_version(path), build)
+
+
+def _readmitted(path):
+    return cached(('readmitted_flags', path), dataset_version(path),
+                  lambda: (load_dataset(columns=['readmitted'], path=path)['readmitted'] != 'NO')
+                  .to_numpy(dtype=np.int64))
+
+
+def readmission_by_group(column='diag_1', path=None):
+    """Encounters, readmissions and readmission rate per diagnosis group of `column` (or 'any')."""
+    index = load_index(path)
+    readmitted = _readmitted(path)
+    return _readmission_table(index.group_counts(column), index.group_counts(column, readmitted),
+                             pd.Index(GROUPS, name='group'))
+
+
+def readmission_by_code(column='diag_1', group=None, path=None):
+    """Encounters, readmissions and readmission rate per code of a diagnosis column, within `group` if given.
+
+    Codes without encounters are left out; the largest codes come first.
+    """
+    index = load_index(path)
+    readmitted = _readmitted(path)
+    rows = None if group is None else index.rows(group, column)
+    table = _readmission_table(index.code_counts(column, rows), index.code_counts(column, rows, readmitted),
+                              index.dictionary.codes.rename('code'))
+    table.insert(0, 'group', [GROUPS[g] for g in index.dictionary.groups])
+    return table[table['encounters'] > 0].sort_values('encounters', ascending=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Readmission rate per ICD-9 diagnosis group.")
+    parser.add_argument('--data', default=None, help="clean dataset (CSV or Feather)")
+    args = parser.parse_args()
+
+    index = load_index(args.data)
+    print(f"{len(index.dictionary)} distinct codes, {len(index)} encounters")
+    for column, label in POSITIONS.items():
+        print(f"\n{label} ({column})")
+        print(readmission_by_group(column, args.data).round(4).to_string())
+
+
+if __name__ == '__main__':
+    main()
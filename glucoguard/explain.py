@@ -0,0 +1,68 @@
+"""SHAP explanations of the readmission model.
+
+The tree explainer is built once per model version. Explanations are kept in
+an LRU cache keyed by the encoded (unscaled) feature vector: the prediction
+form only produces a limited set of distinct profiles, so the same patient
+description is usually explained more than once.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from glucoguard.data import cached
+
+CACHE_SIZE = 4096
+
+
+class RowExplainer:
+    """Tree explainer of one inference pipeline, with a cache of explained rows."""
+
+    def __init__(self, pipeline, cache_size=CACHE_SIZE):
+        import shap
+
+        self.pipeline = pipeline
+        self.explainer = shap.TreeExplainer(pipeline.model)
+        self.base_value = float(np.ravel(self.explainer.expected_value)[0])
+        self.cache_size = cache_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def explain_rows(self, features):
+        """Return the SHAP values (rows x features) of encoded, unscaled feature rows.
+
+        Only the rows missing from the cache are passed to the explainer, in a
+        single call.
+        """
+        rows = np.atleast_2d(np.asarray(features, dtype=np.float64))
+        keys = [row.tobytes() for row in rows]
+        values = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    values[i] = self._cache[key]
+        missing = [i for i, value in enumerate(values) if value is None]
+        self.hits += len(keys) - len(missing)
+        self.misses += len(missing)
+
+        if missing:
+            computed = self.explainer.shap_values(self.pipeline.transform(rows[missing]))
+            computed.flags.writeable = False
+            with self._lock:
+                for i, row_values in zip(missing, computed):
+                    values[i] = self._cache[keys[i]] = row_values
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return np.vstack(values)
+
+    def explain(self, features):
+        """Return the base value and the SHAP values of a single encoded row."""
+        return self.base_value, self.explain_rows(features)[0]
+
+
+def load_explainer(pipeline):
+    """Return the explainer of `pipeline`, built once per model version and shared process-wide."""
+    return cached(('explainer',), pipeline.version, lambda: RowExplainer(pipeline))
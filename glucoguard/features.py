@@ -0,0 +1,57 @@
+"""Feature matrix of the readmission model, built from the clean dataset schema.
+
+The column order is the one used to train the model in
+`5_Predictive_analysis.ipynb`: one-hot nominal features, numerical features,
+medications and pharmacological groups, then the ordinal codes.
+"""
+import numpy as np
+import pandas as pd
+
+from glucoguard.medications import medication_bits, medication_flags
+from glucoguard.schema import MEDICATIONS, ORDINAL_CATEGORIES
+
+# Categories of the one-hot encoded nominal features
+ONE_HOT_CATEGORIES = {
+    'race': ['AfricanAmerican', 'Asian', 'Caucasian', 'Hispanic', 'Other'],
+    'gender': ['Female', 'Male', 'Unknown/Invalid'],
+    'change': ['Ch', 'No'],
+    'diabetesMed': ['No', 'Yes'],
+}
+NUMERICAL_FEATURES = ['time_in_hospital', 'num_lab_procedures', 'num_procedures', 'num_medications']
+# Medications kept as individual features, followed by the pharmacological groups
+MODEL_MEDICATIONS = ['metformin', 'examide', 'citoglipton', 'insulin', 'glyburide-metformin',
+                     'glipizide-metformin', 'glimepiride-pioglitazone', 'metformin-rosiglitazone',
+                     'metformin-pioglitazone', 'SU', 'meglitinides', 'thiazolidinediones',
+                     'glucosidase_inh']
+ORDINAL_FEATURES = list(ORDINAL_CATEGORIES)
+
+# Category lists the nominal and ordinal features are encoded with
+ENCODERS = {'one_hot': ONE_HOT_CATEGORIES, 'ordinal': ORDINAL_CATEGORIES}
+
+
+def feature_columns(encoders=ENCODERS):
+    """Return the names of the model's features, in training order."""
+    one_hot = [f'{col}_{value}' for col, values in encoders['one_hot'].items() for value in values]
+    return one_hot + NUMERICAL_FEATURES + MODEL_MEDICATIONS + list(encoders['ordinal'])
+
+
+FEATURE_COLUMNS = feature_columns()
+
+# Columns of the clean dataset the features are built from
+SOURCE_COLUMNS = list(ONE_HOT_CATEGORIES) + NUMERICAL_FEATURES + MEDICATIONS + ORDINAL_FEATURES
+
+
+def build_features(df, encoders=ENCODERS):
+    """Return the model's feature matrix (as a frame in `feature_columns()` order) for `df`."""
+    parts = [
+        pd.DataFrame({f'{col}_{value}': (df[col] == value).to_numpy(dtype=np.uint8)
+                      for col, values in encoders['one_hot'].items() for value in values},
+                     index=df.index),
+        df[NUMERICAL_FEATURES],
+        medication_flags(medication_bits(df), MODEL_MEDICATIONS, index=df.index),
+        # Unknown values get the code -1, as `cat.codes` does in the notebook
+        pd.DataFrame({col: pd.Categorical(df[col], categories=order, ordered=True).codes
+                      for col, order in encoders['ordinal'].items()},
+                     index=df.index),
+    ]
+    return pd.concat(parts, axis=1)
@@ -0,0 +1,141 @@
+"""Persistent, size-bounded cache of rendered dashboard figures.
+
+Figures are stored on disk, one file per key, as Plotly JSON or PNG bytes.
+A key is any JSON-serializable value; callers include everything the figure
+depends on (the version of its data, the page and the widget values), so
+entries never need to be invalidated, only evicted. The cache is shared by
+every session and survives server restarts. When it grows beyond
+`MAX_BYTES`, the least recently used files are deleted.
+
+Usage:
+    python -m glucoguard.figure_cache warm    # render the common views ahead of time
+    python -m glucoguard.figure_cache clear
+"""
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+
+CACHE_DIR = os.environ.get('GLUCOGUARD_FIGURE_CACHE', '.figure_cache')
+MAX_BYTES = 256 * 1024 * 1024
+
+# Bumped whenever the way figures are stored changes
+FORMAT_VERSION = 1
+
+# Pages whose figures are cached, run by `warm`
+WARM_PAGES = ['pages/1_Data_Summary_*.py', 'pages/2_Data_Investigation_*.py', 'pages/4_Patient_History_*.py']
+
+_evict_lock = threading.Lock()
+
+
+def _path(key, suffix, directory):
+    text = json.dumps([FORMAT_VERSION, key], sort_keys=True, default=str)
+    return os.path.join(directory, f"{hashlib.sha256(text.encode()).hexdigest()}.{suffix}")
+
+
+def _read(path):
+    try:
+        with open(path, 'rb') as file:
+            data = file.read()
+    except FileNotFoundError:
+        return None
+    # The modification time doubles as the last access time for LRU eviction
+    os.utime(path)
+    return data
+
+
+def _write(path, data, directory, max_bytes):
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(data)
+    os.replace(tmp_path, path)
+    evict(max_bytes, directory)
+
+
+def evict(max_bytes=MAX_BYTES, directory=CACHE_DIR):
+    """Delete the least recently used figures until the cache fits in `max_bytes`."""
+    with _evict_lock:
+        try:
+            entries = [entry for entry in os.scandir(directory)
+                       if entry.is_file() and not entry.name.endswith('.tmp')]
+        except FileNotFoundError:
+            return
+        stats = [(entry.stat().st_mtime_ns, entry.stat().st_size, entry.path) for entry in entries]
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+def plotly_figure(key, build, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+    """Return the Plotly figure cached under `key`, calling `build()` on a miss."""
+    import plotly
+    import plotly.io as pio
+
+    path = _path(['plotly', plotly.__version__, key], 'json', directory)
+    data = _read(path)
+    if data is None:
+        figure = build()
+        _write(path, figure.to_json().encode(), directory, max_bytes)
+        return figure
+    return pio.from_json(data.decode(), skip_invalid=True)
+
+
+def png(key, build, directory=CACHE_DIR, max_bytes=MAX_BYTES, dpi=200):
+    """Return the PNG bytes cached under `key`, rendering the matplotlib figure `build()` on a miss.
+
+    `build` must return a `matplotlib.figure.Figure` created without pyplot,
+    so concurrent sessions never share global figure state.
+    """
+    import matplotlib
+
+    path = _path(['png', matplotlib.__version__, dpi, key], 'png', directory)
+    data = _read(path)
+    if data is None:
+        buffer = io.BytesIO()
+        build().savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+        data = buffer.getvalue()
+        _write(path, data, directory, max_bytes)
+    return data
+
+
+def warm(pages=None):
+    """Run the pages headlessly through every selectbox option and checkbox, filling the cache."""
+    from streamlit.testing.v1 import AppTest
+
+    patterns = WARM_PAGES if pages is None else pages
+    for page in sorted(path for pattern in patterns for path in glob.glob(pattern)):
+        app = AppTest.from_file(page, default_timeout=300).run()
+        for i in range(len(app.selectbox)):
+            for option in app.selectbox[i].options:
+                app.selectbox[i].select(option).run()
+        for i in range(len(app.checkbox)):
+            app.checkbox[i].check().run()
+        print(f"Warmed {page}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the dashboard figure cache.")
+    parser.add_argument('command', choices=['warm', 'clear'])
+    parser.add_argument('pages', nargs='*', help="pages to warm (default: the pages with cached figures)")
+    args = parser.parse_args()
+
+    if args.command == 'warm':
+        warm(args.pages or None)
+    else:
+        shutil.rmtree(CACHE_DIR, ignore_errors=True)
+        print(f"Cleared {CACHE_DIR}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""SHAP force plot as a Streamlit component.
+
+`st.components.v1.html` needs the whole SHAP JavaScript bundle inlined in
+every plot. The component instead serves a static page that loads the bundle
+with a `<script src>` (cached by the browser) and only receives the plot data
+on each render.
+"""
+import os
+import shutil
+import tempfile
+
+import streamlit.components.v1 as components
+
+_RESOURCES = os.path.join(os.path.dirname(__file__), 'resources')
+_component = None
+
+
+def _copy(source, destination):
+    tmp_path = f"{destination}.{os.getpid()}.tmp"
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, destination)
+
+
+def _build_dir():
+    """Assemble the component directory: our page next to the installed SHAP bundle."""
+    import shap
+
+    path = os.path.join(tempfile.gettempdir(), f"glucoguard_force_plot_shap-{shap.__version__}")
+    os.makedirs(path, exist_ok=True)
+    _copy(os.path.join(_RESOURCES, 'force_plot.html'), os.path.join(path, 'index.html'))
+    if not os.path.exists(os.path.join(path, 'bundle.js')):
+        _copy(os.path.join(os.path.dirname(shap.__file__), 'plots', 'resources', 'bundle.js'),
+              os.path.join(path, 'bundle.js'))
+    return path
+
+
+def force_plot(base_value, shap_values, features, height=None, key=None):
+    """Draw a SHAP additive force plot of one explained row."""
+    import shap
+
+    global _component
+    if _component is None:
+        _component = components.declare_component('force_plot', path=_build_dir())
+    plot = shap.force_plot(base_value, shap_values, features)
+    plot.data['labelMargin'] = 20
+    return _component(data=plot.data, height=height, key=key, default=None)
@@ -0,0 +1,342 @@
+"""Parallel, sampled and cached feature importance for the readmission target.
+
+The features are encoded like `4_Feature_selection.ipynb`: frequencies of
+the nominal columns (of the diagnoses through the diagnosis dictionary),
+ordinal codes of age, the medications and the lab results, plus the numeric
+counts of its random forest pass. The random forest is fitted on that
+encoding; mutual information and chi-square take the category codes of the
+nominal columns instead, since distinct values can share a frequency.
+Three methods score them:
+    mutual_info  mutual information with readmission (discrete estimator for
+                 the category codes, nearest neighbours for the counts)
+    chi2         Cramér's V of the (value x readmission) table, with its
+                 chi-square statistic and p-value; the numeric counts are
+                 binned into quantiles first (the statistic itself grows with
+                 the number of levels, so it does not rank features)
+    permutation  mean drop of a random forest's ROC AUC on held-out rows
+                 when the feature is shuffled
+
+Every score is computed on `samples` stratified subsamples of `sample_size`
+encounters (the whole dataset when it is smaller), and every (method,
+feature, subsample) is an independent task of a process pool. The ranking
+reports the mean score over the subsamples with a 95% t-interval of the
+mean (approximate, since the subsamples overlap when they are large).
+
+Finished scores are appended to a JSON-lines file and never computed twice.
+A mutual information or chi-square score is keyed by a hash of the
+feature's own column of codes and of the target, so when the values of some
+features change (say, re-coded diagnoses), only those features are scored
+again. New or removed encounters change the target, and so re-score every
+feature. A permutation score depends on the model fitted on all the
+features and is keyed by the hash of the whole matrix. Every key also holds
+the encoding version and the sampling parameters.
+
+Usage:
+    python -m glucoguard.importance run [--methods mutual_info chi2] [--samples 5] [--sample-size 20000]
+    python -m glucoguard.importance report
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from glucoguard.data import load_dataset
+from glucoguard.diagnoses import DIAGNOSIS_COLUMNS, DiagnosisDictionary
+from glucoguard.schema import MEDICATIONS, ORDINAL_CATEGORIES
+from glucoguard.training import RANDOM_SEED, read_results
+
+RESULTS_PATH = "importance_results.jsonl"
+METHODS = ['mutual_info', 'chi2', 'permutation']
+SAMPLES = 5
+SAMPLE_SIZE = 20_000
+PERMUTATION_REPEATS = 5
+# Share of every subsample the permutation model is evaluated on
+HOLDOUT = 0.25
+# Quantile bins of the numeric features in the chi-square tables
+CHI2_BINS = 5
+
+# Bump when `encode` changes, so that cached scores of the old encoding are not reused
+ENCODING = 'frequency-ordinal/2'
+FREQUENCY_ENCODED = ['diag_1', 'diag_2', 'diag_3', 'admission_type_id', 'discharge_disposition_id',
+                     'admission_source_id', 'race', 'gender', 'change', 'diabetesMed']
+MEDICATION_LEVELS = ['No', 'Down', 'Steady', 'Up']
+ORDINAL_ENCODED = {'age': ORDINAL_CATEGORIES['age'],
+                   **{med: MEDICATION_LEVELS for med in MEDICATIONS},
+                   'max_glu_serum_transformed': ORDINAL_CATEGORIES['max_glu_serum_transformed'],
+                   'A1Cresult_transformed': ORDINAL_CATEGORIES['A1Cresult_transformed']}
+NUMERIC_FEATURES = ['time_in_hospital', 'num_lab_procedures', 'num_procedures', 'num_medications',
+                    'number_diagnoses']
+
+SOURCE_COLUMNS = FREQUENCY_ENCODED + list(ORDINAL_ENCODED) + NUMERIC_FEATURES
+
+# Set in each worker by `_init_worker`
+_data = None
+_models = {}
+
+
+def _nominal_codes(df, dictionary):
+    """Category codes of every nominal column (diagnosis ids for the diagnoses, -1 when missing)."""
+    codes = {}
+    for col in FREQUENCY_ENCODED:
+        if col in DIAGNOSIS_COLUMNS:
+            codes[col] = dictionary.encode(df[col]).astype(np.int64)
+        else:
+            codes[col] = pd.factorize(df[col], sort=True)[0]
+    return codes
+
+
+def encode(df, codes=False):
+    """Return the encoded features of `df` (missing nominal values get frequency 0, unknown levels -1).
+
+    With `codes`, the nominal columns hold their category codes instead of
+    their frequencies.
+    """
+    dictionary = DiagnosisDictionary.from_frame(df, [col for col in FREQUENCY_ENCODED if col in DIAGNOSIS_COLUMNS])
+    nominal = _nominal_codes(df, dictionary)
+    columns = {}
+    for col in FREQUENCY_ENCODED:
+        if codes:
+            columns[f'{col}_encoded'] = nominal[col].astype(np.float64)
+        elif col in DIAGNOSIS_COLUMNS:
+            columns[f'{col}_encoded'] = dictionary.frequency_encode(df[col]).fillna(0.0).to_numpy()
+        else:
+            valid = nominal[col] >= 0
+            frequencies = np.bincount(nominal[col][valid]) / len(df)
+            columns[f'{col}_encoded'] = np.where(valid, frequencies[nominal[col].clip(min=0)], 0.0)
+    for col, order in ORDINAL_ENCODED.items():
+        columns[col] = pd.Categorical(df[col], categories=order, ordered=True).codes.astype(np.float64)
+    for col in NUMERIC_FEATURES:
+        columns[col] = df[col].to_numpy(dtype=np.float64)
+    return pd.DataFrame(columns, index=df.index)
+
+
+def importance_data(path=None):
+    """Return the encoded features and the codes (float64 matrices), their names and the binary target."""
+    df = load_dataset(columns=SOURCE_COLUMNS + ['readmitted'], path=path)
+    features = encode(df)
+    codes = encode(df, codes=True)
+    target = (df['readmitted'] != 'NO').to_numpy(dtype=np.int64)
+    return features.to_numpy(), codes.to_numpy(), list(features.columns), target
+
+
+def _hash(array):
+    return hashlib.blake2b(np.ascontiguousarray(array).tobytes(), digest_size=16).hexdigest()
+
+
+def sample_rows(target, sample, sample_size, seed=RANDOM_SEED):
+    """Rows of stratified subsample number `sample` (all rows when `sample_size` is None or too large)."""
+    from sklearn.model_selection import train_test_split
+
+    rows = np.arange(len(target))
+    if sample_size is None or sample_size >= len(target):
+        return rows
+    picked, _ = train_test_split(rows, train_size=sample_size, stratify=target,
+                                 random_state=np.random.RandomState([seed, sample]))
+    return np.sort(picked)
+
+
+def _init_worker(path, threads):
+    from threadpoolctl import threadpool_limits
+
+    global _data
+    threadpool_limits(threads)
+    _data = importance_data(path)
+
+
+def _score(method, feature, sample, sample_size, seed):
+    """Mutual information or chi-square of one feature on one subsample; runs in a worker process."""
+    start = time.perf_counter()
+    _, codes, names, target = _data
+    rows = sample_rows(target, sample, sample_size, seed)
+    column, truth = codes[rows, feature], target[rows]
+    if method == 'mutual_info':
+        from sklearn.feature_selection import mutual_info_classif
+
+        discrete = names[feature] not in NUMERIC_FEATURES
+        score = mutual_info_classif(column[:, None], truth, discrete_features=discrete, random_state=seed)[0]
+        result = {'score': float(score)}
+    else:
+        from glucoguard.association import chi_square, contingency_tables
+
+        if names[feature] in NUMERIC_FEATURES:
+            column = pd.qcut(column, CHI2_BINS, labels=False, duplicates='drop')
+        tables = contingency_tables(pd.DataFrame({names[feature]: column}), [names[feature]], pd.Series(truth))
+        test = chi_square(tables).iloc[0]
+        result = {'score': float(test['cramers_v']), 'chi2': float(test['chi2']),
+                  'p_value': float(test['p_value'])}
+    return {**result, 'rows': len(rows), 'seconds': time.perf_counter() - start}
+
+
+def _split(rows, target, seed):
+    from sklearn.model_selection import train_test_split
+
+    return train_test_split(rows, test_size=HOLDOUT, stratify=target[rows], random_state=seed)
+
+
+def _fit(sample, sample_size, seed, directory):
+    """Fit the permutation model of one subsample and store it in `directory`; runs in a worker process."""
+    from sklearn.ensemble import RandomForestClassifier
+
+    features, _, _, target = _data
+    train, _ = _split(sample_rows(target, sample, sample_size, seed), target, seed)
+    model = RandomForestClassifier(n_estimators=100, random_state=seed, n_jobs=1)
+    model.fit(features[train], target[train])
+    path = os.path.join(directory, f"model-{sample}.pkl")
+    with open(path, 'wb') as file:
+        pickle.dump(model, file, protocol=pickle.HIGHEST_PROTOCOL)
+    return path
+
+
+def _permutation(feature, sample, sample_size, seed, model_path, repeats):
+    """Permutation importance of one feature on one subsample's held-out rows; runs in a worker process."""
+    from sklearn.metrics import roc_auc_score
+
+    start = time.perf_counter()
+    features, _, _, target = _data
+    if model_path not in _models:
+        with open(model_path, 'rb') as file:
+            _models[model_path] = pickle.load(file)
+    model = _models[model_path]
+    _, test = _split(sample_rows(target, sample, sample_size, seed), target, seed)
+    X, truth = features[test], target[test]
+    baseline = roc_auc_score(truth, model.predict_proba(X)[:, 1])
+    rng = np.random.default_rng([seed, sample, feature])
+    original = X[:, feature].copy()
+    drops = []
+    for _ in range(repeats):
+        X[:, feature] = rng.permutation(original)
+        drops.append(baseline - roc_auc_score(truth, model.predict_proba(X)[:, 1]))
+    return {'score': float(np.mean(drops)), 'repeat_std': float(np.std(drops)),
+            'baseline_roc_auc': float(baseline), 'rows': len(test), 'seconds': time.perf_counter() - start}
+
+
+def _task_key(method, name, data_hash, sample, sample_size, seed):
+    params = {}
+    if method == 'permutation':
+        params = {'repeats': PERMUTATION_REPEATS, 'holdout': HOLDOUT}
+    elif method == 'chi2':
+        params = {'score': 'cramers_v', 'bins': CHI2_BINS}
+    return json.dumps([method, name, data_hash, ENCODING, sample, sample_size, seed, params], sort_keys=True)
+
+
+def run(methods=METHODS, path=None, results_path=RESULTS_PATH, samples=SAMPLES, sample_size=SAMPLE_SIZE,
+        n_jobs=None, threads_per_job=1, seed=RANDOM_SEED, compute=True):
+    """Score every feature with `methods` in parallel, reusing the scores cached in `results_path`.
+
+    Returns the records of every (method, feature, subsample) score of the
+    current data, computed in this call or in an earlier one. With `compute`
+    false, missing scores are left out instead of being computed.
+    """
+    features, codes, names, target = importance_data(path)
+    if sample_size is None or sample_size >= len(target):
+        samples, sample_size = 1, None
+    target_hash = _hash(target)
+    code_hashes = [_hash(codes[:, j]) for j in range(len(names))]
+    matrix_hash = _hash(np.array([_hash(features[:, j]) for j in range(len(names))] + [target_hash]))
+    del features, codes
+
+    done = {record['key']: record for record in read_results(results_path)}
+    keys, pending = [], []
+    for method in methods:
+        for j, name in enumerate(names):
+            data_hash = matrix_hash if method == 'permutation' else f"{code_hashes[j]}-{target_hash}"
+            for sample in range(samples):
+                key = _task_key(method, name, data_hash, sample, sample_size, seed)
+                keys.append(key)
+                if key not in done:
+                    pending.append((key, method, j, sample))
+
+    if pending and compute:
+        n_jobs = min(n_jobs or os.cpu_count() or 1, len(pending))
+        with ProcessPoolExecutor(n_jobs, initializer=_init_worker, initargs=(path, threads_per_job)) as pool, \
+                tempfile.TemporaryDirectory() as model_dir, \
+                open(results_path, 'a', encoding='utf-8') as out:
+            futures = {}
+            for task in pending:
+                _, method, j, sample = task
+                if method != 'permutation':
+                    futures[pool.submit(_score, method, j, sample, sample_size, seed)] = task
+            # Permutation tasks are submitted once the model of their subsample is fitted
+            waiting = {}
+            for task in pending:
+                if task[1] == 'permutation':
+                    waiting.setdefault(task[3], []).append(task)
+            for sample in waiting:
+                futures[pool.submit(_fit, sample, sample_size, seed, model_dir)] = ('fit', sample)
+
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = futures.pop(future)
+                    if task[0] == 'fit':
+                        for permutation_task in waiting[task[1]]:
+                            _, _, j, sample = permutation_task
+                            futures[pool.submit(_permutation, j, sample, sample_size, seed, future.result(),
+                                                PERMUTATION_REPEATS)] = permutation_task
+                        continue
+                    key, method, j, sample = task
+                    record = {'key': key, 'method': method, 'feature': names[j], 'sample': sample,
+                              **future.result()}
+                    # One line per finished score, on disk before the next one is reported
+                    out.write(json.dumps(record) + '\n')
+                    out.flush()
+                    os.fsync(out.fileno())
+                    done[key] = record
+    return [done[key] for key in keys if key in done]
+
+
+def ranking(records):
+    """Mean score, its spread and 95% t-interval over the subsamples and the rank of every feature, per method."""
+    from scipy.stats import t
+
+    df = pd.DataFrame(records)
+    table = df.groupby(['method', 'feature'], sort=False)['score'].agg(score='mean', std='std', samples='count')
+    # NaN with a single subsample
+    half_width = t.ppf(0.975, table['samples'] - 1) * table['std'] / np.sqrt(table['samples'])
+    table.insert(2, 'ci_low', table['score'] - half_width)
+    table.insert(3, 'ci_high', table['score'] + half_width)
+    table['rank'] = table.groupby(level='method')['score'].rank(ascending=False, method='min').astype(int)
+    return table.sort_values(['method', 'rank'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank the features by their importance for readmission.")
+    parser.add_argument('--results', default=RESULTS_PATH, help="JSON-lines file of computed scores")
+    parser.add_argument('--data', default=None, help="clean dataset (CSV or Feather)")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--threads', type=int, default=1, help="BLAS/OpenMP threads per worker")
+    scoring = argparse.ArgumentParser(add_help=False)
+    scoring.add_argument('--methods', nargs='+', choices=METHODS, default=METHODS)
+    scoring.add_argument('--samples', type=int, default=SAMPLES, help="stratified subsamples per score")
+    scoring.add_argument('--sample-size', type=int, default=SAMPLE_SIZE,
+                         help="encounters per subsample (0 for the whole dataset)")
+    scoring.add_argument('--top', type=int, default=15, help="features shown per method")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('run', parents=[scoring], help="compute the missing scores and print the ranking")
+    subparsers.add_parser('report', parents=[scoring],
+                          help="print the ranking of the cached scores of the current data")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    records = run(args.methods, path=args.data, results_path=args.results, samples=args.samples,
+                  sample_size=args.sample_size or None, n_jobs=args.jobs, threads_per_job=args.threads,
+                  compute=args.command == 'run')
+    if args.command == 'run':
+        print(f"Finished in {time.perf_counter() - start:.1f} s")
+    if not records:
+        print(f"No cached scores of the current data in {args.results}")
+        return
+    table = ranking(records)
+    with pd.option_context('display.width', 200, 'display.max_rows', 500, 'display.max_columns', 20):
+        print(table[table['rank'] <= args.top].round(5))
+
+
+if __name__ == '__main__':
+    main()
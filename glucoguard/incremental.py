@@ -0,0 +1,157 @@
+"""Incremental updates of the deployed readmission model on new encounters.
+
+Instead of retraining on the whole history, `update` adds a few boosting
+iterations to the deployed HistGradientBoosting model, fitted on a batch of
+newly arrived encounters (warm start). The fitted scaler and encoders are
+kept as they are, so the existing trees keep their meaning.
+
+sklearn refits the feature bins on every call to `fit`, which is harmless
+when warm-starting on the same data but not on a new batch: the stored trees
+split on bin indices of the original binning while training, so the boosting
+would start from wrong raw predictions. The update therefore bins the new
+batch with the model's original bins.
+
+Part of the batch is held out to compare the deployed and the updated model,
+and the deployed model's metrics on it are compared with the ones recorded at
+the previous update (drift). The artifact is replaced atomically, and only if
+the updated model is not worse than the deployed one by more than
+`max_regression` ROC AUC; the previous artifact is kept next to it.
+
+Usage:
+    python -m glucoguard.incremental new_encounters.csv [--iterations 20] [--dry-run]
+"""
+import argparse
+import copy
+import os
+import shutil
+
+import numpy as np
+
+from glucoguard.data import load_dataset
+from glucoguard.features import SOURCE_COLUMNS
+from glucoguard.inference import ARTIFACT_PATH, load_pipeline, make_artifact, save_artifact
+
+ITERATIONS = 20
+HOLDOUT = 0.2
+MAX_REGRESSION = 0.01
+RANDOM_SEED = 2023
+
+
+def evaluate(model, features, target):
+    """Metrics of a fitted classifier on scaled features."""
+    from sklearn.metrics import accuracy_score, f1_score, log_loss, roc_auc_score
+
+    probability = model.predict_proba(features)[:, 1]
+    predicted = (probability >= 0.5).astype(np.int64)
+    has_both = len(np.unique(target)) == 2
+    return {
+        'rows': int(len(target)),
+        'readmission_rate': float(target.mean()),
+        'accuracy': float(accuracy_score(target, predicted)),
+        'f1': float(f1_score(target, predicted, zero_division=0)),
+        'roc_auc': float(roc_auc_score(target, probability)) if has_both else float('nan'),
+        'log_loss': float(log_loss(target, probability, labels=[0, 1])),
+    }
+
+
+def continue_boosting(model, features, target, iterations=ITERATIONS):
+    """Return a copy of `model` with `iterations` more trees fitted on scaled `features`."""
+    updated = copy.deepcopy(model)
+    bin_mapper = updated._bin_mapper
+
+    def bin_data(X, is_training_data):
+        # Keep the original bins, which the stored trees were grown on
+        updated._bin_mapper = bin_mapper
+        X_binned = bin_mapper.transform(X)
+        return X_binned if is_training_data else np.ascontiguousarray(X_binned)
+
+    updated.set_params(warm_start=True, early_stopping=False, max_iter=updated.n_iter_ + iterations)
+    updated._bin_data = bin_data
+    try:
+        updated.fit(features, target)
+    finally:
+        del updated._bin_data
+        updated._bin_mapper = bin_mapper
+    return updated
+
+
+def update(new_rows, artifact_path=ARTIFACT_PATH, iterations=ITERATIONS, holdout=HOLDOUT,
+           max_regression=MAX_REGRESSION, dry_run=False):
+    """Warm-start the deployed model on `new_rows` (clean dataset schema) and swap the artifact.
+
+    Returns a report with the deployed model's metrics at the previous update
+    ('reference') and on the held-out part of the batch ('deployed'), the
+    updated model's metrics on it ('updated'), the drift of the deployed
+    metrics and whether the artifact was replaced.
+    """
+    from sklearn.model_selection import train_test_split
+
+    pipeline = load_pipeline(artifact_path)
+    features = pipeline.transform(pipeline.features(new_rows))
+    target = (new_rows['readmitted'] != 'NO').to_numpy(dtype=np.int64)
+    stratify = target if np.bincount(target, minlength=2).min() >= 2 else None
+    train_X, val_X, train_y, val_y = train_test_split(features, target, test_size=holdout,
+                                                      random_state=RANDOM_SEED, stratify=stratify)
+
+    reference = getattr(pipeline, 'validation_metrics', None)
+    deployed = evaluate(pipeline.model, val_X, val_y)
+    model = continue_boosting(pipeline.model, train_X, train_y, iterations)
+    updated = evaluate(model, val_X, val_y)
+
+    report = {
+        'parent_version': pipeline.version,
+        'iterations': f"{pipeline.model.n_iter_} -> {model.n_iter_}",
+        'reference': reference,
+        'deployed': deployed,
+        'updated': updated,
+        'drift': {name: deployed[name] - reference[name] for name in ('accuracy', 'f1', 'roc_auc', 'log_loss')}
+        if reference else None,
+    }
+    regression = deployed['roc_auc'] - updated['roc_auc']
+    report['swapped'] = not dry_run and not regression > max_regression
+    if report['swapped']:
+        artifact = make_artifact(model, pipeline.scaler, pipeline.encoders)
+        if artifact['model_version'] == pipeline.version:
+            # Several updates within a second still get distinct versions
+            artifact['model_version'] += f".{model.n_iter_}"
+        artifact['parent_version'] = pipeline.version
+        artifact['validation_metrics'] = updated
+        if os.path.exists(artifact_path):
+            shutil.copy2(artifact_path, f"{artifact_path}.prev")
+        save_artifact(artifact, artifact_path)
+        report['model_version'] = artifact['model_version']
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the deployed model on newly arrived encounters.")
+    parser.add_argument('new_rows', help="new encounters in the clean dataset schema (CSV or Feather)")
+    parser.add_argument('--artifact', default=ARTIFACT_PATH)
+    parser.add_argument('--iterations', type=int, default=ITERATIONS, help="boosting iterations to add")
+    parser.add_argument('--holdout', type=float, default=HOLDOUT, help="fraction of the batch held out")
+    parser.add_argument('--max-regression', type=float, default=MAX_REGRESSION,
+                        help="largest ROC AUC drop on the held-out rows that still swaps the artifact")
+    parser.add_argument('--dry-run', action='store_true', help="report without replacing the artifact")
+    args = parser.parse_args()
+
+    new_rows = load_dataset(columns=SOURCE_COLUMNS + ['readmitted'], path=args.new_rows)
+    report = update(new_rows, args.artifact, args.iterations, args.holdout, args.max_regression, args.dry_run)
+
+    print(f"Model {report['parent_version']}: {report['iterations']} iterations")
+    print(f"{'':<10} {'accuracy':>9} {'f1':>7} {'roc_auc':>8} {'log_loss':>9} {'rows':>7}")
+    for name in ('reference', 'deployed', 'updated'):
+        metrics = report[name]
+        if metrics:
+            print(f"{name:<10} {metrics['accuracy']:>9.4f} {metrics['f1']:>7.4f} {metrics['roc_auc']:>8.4f} "
+                  f"{metrics['log_loss']:>9.4f} {metrics['rows']:>7}")
+    if report['drift']:
+        print("Drift of the deployed model since the last update: "
+              + ", ".join(f"{name} {value:+.4f}" for name, value in report['drift'].items()))
+    if report['swapped']:
+        print(f"Replaced {args.artifact} with model {report['model_version']} (previous kept as {args.artifact}.prev)")
+    elif not args.dry_run:
+        print(f"Kept the deployed model: ROC AUC would drop by more than {args.max_regression}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Versioned inference artifact of the readmission model.
+
+The training notebook exports a single pickle holding everything needed to
+score an encounter: the category lists used to encode the features, the
+fitted min-max scaler, the HistGradientBoosting model and the feature order.
+The app loads it once per process; per request it only transforms and
+predicts.
+
+Usage (builds the artifact from the legacy `model.pkl` and the clean dataset):
+    python -m glucoguard.inference export
+"""
+import argparse
+import logging
+import os
+import pickle
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from glucoguard.data import cached, dataset_version, file_version, load_dataset
+from glucoguard.features import ENCODERS, SOURCE_COLUMNS, build_features, feature_columns
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_PATH = "jupyter-notebooks/model_pipeline.pkl"
+MODEL_PATH = "jupyter-notebooks/model.pkl"
+
+# Bumped whenever the layout of the artifact dictionary changes
+FORMAT_VERSION = 1
+
+
+class InferencePipeline:
+    """Encoders, fitted scaler and model of one exported artifact."""
+
+    def __init__(self, artifact, load_seconds=None):
+        if artifact['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported model artifact format {artifact['format_version']}")
+        self.version = artifact['model_version']
+        self.encoders = artifact['encoders']
+        self.feature_columns = artifact['feature_columns']
+        self.scaler = artifact['scaler']
+        self.model = artifact['model']
+        # Metrics on held-out encounters when the model was trained or last updated
+        self.validation_metrics = artifact.get('validation_metrics')
+        self.load_seconds = load_seconds
+
+    def features(self, df):
+        """Encode encounters in the clean dataset schema (unscaled, in feature order)."""
+        return build_features(df, self.encoders)[self.feature_columns]
+
+    def transform(self, features):
+        """Scale an encoded feature frame or matrix the way the training data was scaled."""
+        return self.scaler.transform(np.asarray(features, dtype=np.float64))
+
+    def predict_proba(self, features):
+        """Return the probability of readmission for already encoded features."""
+        return self.model.predict_proba(self.transform(features))[:, 1]
+
+
+def make_artifact(model, scaler, encoders=ENCODERS):
+    """Bundle a fitted model and scaler into an artifact dictionary."""
+    import sklearn
+
+    return {
+        'format_version': FORMAT_VERSION,
+        'model_version': datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ'),
+        'sklearn_version': sklearn.__version__,
+        'encoders': encoders,
+        'feature_columns': feature_columns(encoders),
+        'scaler': scaler,
+        'model': model,
+    }
+
+
+def save_artifact(artifact, path=ARTIFACT_PATH):
+    """Write `artifact` atomically, so a running app never reads a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as file:
+        pickle.dump(artifact, file)
+    os.replace(tmp_path, path)
+
+
+def export_pipeline(model, scaler, path=ARTIFACT_PATH, validation_metrics=None):
+    """Export a fitted model and scaler as the versioned inference artifact.
+
+    `validation_metrics` (see `glucoguard.incremental.evaluate`) is the
+    reference later incremental updates measure drift against.
+    """
+    artifact = make_artifact(model, scaler)
+    if validation_metrics is not None:
+        artifact['validation_metrics'] = validation_metrics
+    save_artifact(artifact, path)
+    return artifact
+
+
+def legacy_artifact(model_path=MODEL_PATH):
+    """Build an artifact from the bare `model.pkl` written by older notebooks.
+
+    The scaler is refitted on the features of the whole clean dataset, which
+    is what the notebook fitted it on before the split.
+    """
+    from sklearn.preprocessing import MinMaxScaler
+
+    with open(model_path, 'rb') as file:
+        model = pickle.load(file)
+    features = build_features(load_dataset(columns=SOURCE_COLUMNS))
+    return make_artifact(model, MinMaxScaler().fit(features.to_numpy(dtype=np.float64)))
+
+
+def _load(path):
+    start = time.perf_counter()
+    if os.path.exists(path):
+        with open(path, 'rb') as file:
+            artifact = pickle.load(file)
+    else:
+        logger.warning("%s not found, building the pipeline from %s", path, MODEL_PATH)
+        artifact = legacy_artifact()
+    pipeline = InferencePipeline(artifact, load_seconds=time.perf_counter() - start)
+    logger.info("Loaded model %s in %.0f ms", pipeline.version, pipeline.load_seconds * 1000)
+    return pipeline
+
+
+def load_pipeline(path=ARTIFACT_PATH):
+    """Return the inference pipeline, loaded once per artifact version and shared process-wide."""
+    if os.path.exists(path):
+        version = file_version(path)
+    else:
+        version = f"legacy-{file_version(MODEL_PATH)}-{dataset_version()}"
+    return cached(('pipeline', os.path.abspath(path)), version, lambda: _load(path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the readmission model as an inference artifact.")
+    parser.add_argument('command', choices=['export'])
+    parser.add_argument('--model', default=MODEL_PATH, help="pickled model to package")
+    parser.add_argument('--output', default=ARTIFACT_PATH)
+    args = parser.parse_args()
+
+    artifact = legacy_artifact(args.model)
+    save_artifact(artifact, args.output)
+    print(f"Wrote {args.output} (model version {artifact['model_version']})")
+
+
+if __name__ == '__main__':
+    main()
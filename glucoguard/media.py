@@ -0,0 +1,74 @@
+"""Logo and walkthrough video of the dashboard.
+
+With `server.enableStaticServing` (see .streamlit/config.toml) the files in
+`static/` are served at `app/static/` by a Tornado static file handler, which
+sends ETag and Last-Modified headers. Pages embed the logo as HTML, so
+browsers fetch it once and cache it. Passing the bytes to `st.image` instead
+reads the file and pushes it to every session. URLs carry the file's mtime
+and size as `?v=`, which makes Tornado mark the response cacheable for a long
+time; an edited file gets a new URL.
+
+The static route only sends image types with their MIME type; anything else
+goes out as text/plain with `X-Content-Type-Options: nosniff`, which browsers
+refuse to play as video. The walkthrough video is therefore served by
+Streamlit's media file handler, which sends its MIME type and answers range
+requests. `st.video(path)` would read and hash the whole file on every rerun,
+so the file is registered with the media file storage once per process (and
+version of the file) and the page only embeds its URL; the server keeps one
+copy of the video, whatever the number of sessions.
+"""
+import os
+from urllib.parse import quote
+
+import streamlit as st
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static')
+STATIC_ROUTE = 'app/static'
+ASSETS_DIR = os.path.join(os.path.dirname(STATIC_DIR), 'assets')
+
+LOGO = 'glucoguard-logo.png'
+WALKTHROUGH_VIDEO = 'glucoguard-walkthrough.mp4'
+
+
+def static_url(name):
+    """Return the (page-relative) URL of `static/<name>`, versioned by its mtime and size."""
+    stat = os.stat(os.path.join(STATIC_DIR, name))
+    return f"{STATIC_ROUTE}/{quote(name)}?v={stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+def sidebar_logo():
+    """Show the GlucoGuard logo at the top of the sidebar."""
+    st.sidebar.markdown(f'<img src="{static_url(LOGO)}" alt="GlucoGuard" style="width: 100%;">',
+                        unsafe_allow_html=True)
+
+
+def _media_url(path, mimetype):
+    """Register `path` with Streamlit's media file storage and return its (page-relative) URL.
+
+    Files registered here are not tied to a session, so Streamlit never
+    removes them as orphans.
+    """
+    from streamlit import runtime
+    from streamlit.runtime.media_file_storage import MediaFileKind
+
+    storage = runtime.get_instance().media_file_mgr._storage
+    return storage.get_url(storage.load_and_get_id(path, mimetype, MediaFileKind.MEDIA)).lstrip('/')
+
+
+def video(name, mimetype='video/mp4'):
+    """Show the video `assets/<name>`, served by Streamlit's media file handler."""
+    from streamlit import runtime
+
+    from glucoguard.data import cached, file_version
+
+    path = os.path.join(ASSETS_DIR, name)
+    if not os.path.exists(path):
+        st.info(f"The video {name} is not available in this deployment.")
+        return
+    if not runtime.exists():
+        # Bare mode (e.g. AppTest) has no media file storage
+        st.video(path, format=mimetype)
+        return
+    url = cached(('media', path), file_version(path), lambda: _media_url(path, mimetype))
+    st.markdown(f'<video controls preload="metadata" style="width: 100%;">'
+                f'<source src="{url}" type="{mimetype}"></video>', unsafe_allow_html=True)
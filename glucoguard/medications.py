@@ -0,0 +1,61 @@
+"""Bit-packed representation of the 23 medication columns.
+
+Every encounter's medications are packed into a single uint32: bit `i` is set
+when `MEDICATIONS[i]` was prescribed (any value other than 'No'). The mask is
+built column by column from the categorical codes, and a pharmacological
+group is used when any of its members' bits is set, i.e. a bitwise OR.
+"""
+import numpy as np
+import pandas as pd
+
+from glucoguard.data import cached, dataset_version, load_dataset
+from glucoguard.schema import MEDICATION_GROUPS, MEDICATIONS
+
+MEDICATION_BITS = {med: np.uint32(1 << i) for i, med in enumerate(MEDICATIONS)}
+
+# Masks of the individual medications and of the pharmacological groups
+MASKS = {
+    **MEDICATION_BITS,
+    **{group: np.bitwise_or.reduce([MEDICATION_BITS[med] for med in members])
+       for group, members in MEDICATION_GROUPS.items()},
+}
+
+
+def _prescribed(column):
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = column.cat.categories
+        codes = column.cat.codes.to_numpy()
+        if 'No' not in categories:
+            return codes >= 0
+        return (codes >= 0) & (codes != categories.get_loc('No'))
+    return column.to_numpy() != 'No'
+
+
+def medication_bits(df):
+    """Return one uint32 bitmask per encounter of `df` (see `MEDICATION_BITS`)."""
+    bits = np.zeros(len(df), dtype=np.uint32)
+    for med, bit in MEDICATION_BITS.items():
+        bits |= _prescribed(df[med]).astype(np.uint32) * bit
+    return bits
+
+
+def load_medication_bits(path=None):
+    """Return the bitmasks of the whole dataset, built once per dataset version."""
+    return cached(('medication_bits', path), dataset_version(path),
+                  lambda: medication_bits(load_dataset(columns=MEDICATIONS, path=path)))
+
+
+def uses(bits, name):
+    """Return a boolean array telling which encounters received medication or group `name`."""
+    return (bits & MASKS[name]) != 0
+
+
+def medication_matrix(bits):
+    """Expand bitmasks into an (encounters x 23) uint8 matrix in `MEDICATIONS` order."""
+    shifts = np.arange(len(MEDICATIONS), dtype=np.uint32)
+    return ((bits[:, None] >> shifts) & 1).astype(np.uint8)
+
+
+def medication_flags(bits, names, index=None):
+    """Return a frame of 0/1 uint8 flags, one column per medication or group in `names`."""
+    return pd.DataFrame({name: uses(bits, name).astype(np.uint8) for name in names}, index=index)
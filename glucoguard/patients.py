@@ -0,0 +1,209 @@
+"""Patient-level index of the encounters and per-patient history features.
+
+The index sorts the encounters by `patient_nbr` and then by `encounter_id`,
+and keeps the offset of every patient's first encounter, so the history of a
+patient is a slice of the sorted rows, found with a hash lookup of the
+patient number. The dataset has no admission dates; encounter ids increase
+with time, so they order the stays.
+
+For every encounter the index also holds features of the patient's history
+before it:
+    prior_encounters    number of earlier encounters of the patient
+    previous_outcome    readmission outcome of the previous encounter
+    prior_readmissions  earlier encounters that were followed by a readmission
+    prior_days          days spent in hospital during the earlier encounters
+Days between stays cannot be derived without dates; `prior_days` is the
+closest measure of earlier hospital use the dataset allows.
+
+The index can be built offline and is used unless the dataset has been
+rewritten after it, in which case it is rebuilt in memory.
+
+Usage:
+    python -m glucoguard.patients build [--data diabetes_clean.feather]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+from glucoguard.data import artifact_source, artifact_version, cached, dataset_version, file_version, load_dataset
+
+INDEX_PATH = "diabetes_patients.npz"
+
+# Columns of the clean dataset the index is built from
+SOURCE_COLUMNS = ['patient_nbr', 'encounter_id', 'readmitted', 'time_in_hospital']
+# Columns shown in a patient's history
+HISTORY_COLUMNS = ['encounter_id', 'age', 'admission_type_id', 'discharge_disposition_id', 'time_in_hospital',
+                   'num_lab_procedures', 'num_medications', 'number_inpatient', 'diag_1', 'insulin', 'change',
+                   'readmitted']
+OUTCOMES = ['NO', '>30', '<30']
+UNKNOWN_OUTCOME = 'Unknown'
+
+
+class PatientIndex:
+    """Encounter rows sorted by patient and encounter, with the offsets of every patient."""
+
+    def __init__(self, patients, offsets, rows, outcomes, prior_encounters, prior_readmissions, prior_days):
+        self.patients = patients
+        self.offsets = offsets
+        # Aligned with the sorted encounters: dataset row, outcome code (index into OUTCOMES, -1 if unknown)
+        self.rows = rows
+        self.outcomes = outcomes
+        self.prior_encounters = prior_encounters
+        self.prior_readmissions = prior_readmissions
+        self.prior_days = prior_days
+        self._positions = pd.Index(patients)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build the index of a frame with the `SOURCE_COLUMNS`."""
+        rows = np.lexsort((df['encounter_id'].to_numpy(), df['patient_nbr'].to_numpy()))
+        patient = df['patient_nbr'].to_numpy()[rows]
+        starts = np.flatnonzero(np.r_[True, patient[1:] != patient[:-1]])
+        offsets = np.r_[starts, len(rows)].astype(np.int64)
+
+        # Position of every sorted encounter's first sibling, to turn running sums into per-patient ones
+        first = np.repeat(starts, np.diff(offsets))
+        outcomes = pd.Categorical(df['readmitted'].to_numpy()[rows], categories=OUTCOMES).codes.astype(np.int8)
+        days = df['time_in_hospital'].to_numpy(dtype=np.int64)[rows]
+
+        def prior_sum(values):
+            running = np.r_[0, np.cumsum(values)]
+            return (running[:-1] - running[first]).astype(np.int32)
+
+        return cls(
+            patients=patient[starts].astype(np.int64),
+            offsets=offsets,
+            rows=rows.astype(np.int64),
+            outcomes=outcomes,
+            prior_encounters=(np.arange(len(rows)) - first).astype(np.int32),
+            prior_readmissions=prior_sum(outcomes > 0),
+            prior_days=prior_sum(days),
+        )
+
+    def __len__(self):
+        return len(self.patients)
+
+    def previous_outcomes(self):
+        """Outcome code of every sorted encounter's previous encounter (-1 for a first encounter or unknown)."""
+        previous = np.r_[-1, self.outcomes[:-1]].astype(np.int8)
+        return np.where(self.prior_encounters > 0, previous, -1).astype(np.int8)
+
+    def encounters(self, patient_nbr):
+        """Slice of the sorted encounters of a patient (KeyError for an unknown patient)."""
+        i = self._positions.get_loc(patient_nbr)
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def features(self, patient_nbr):
+        """History features of every encounter of a patient, in encounter order."""
+        part = self.encounters(patient_nbr)
+        previous = np.r_[-1, self.outcomes[part][:-1]]
+        return pd.DataFrame({
+            'prior_encounters': self.prior_encounters[part],
+            'previous_outcome': [OUTCOMES[code] if code >= 0 else None if i == 0 else UNKNOWN_OUTCOME
+                                 for i, code in enumerate(previous)],
+            'prior_readmissions': self.prior_readmissions[part],
+            'prior_days': self.prior_days[part],
+        }, index=pd.Index(self.rows[part], name='row'))
+
+    def encounter_counts(self):
+        """Number of encounters of every patient, indexed by patient number."""
+        return pd.Series(np.diff(self.offsets), index=pd.Index(self.patients, name='patient_nbr'))
+
+    def save(self, path=INDEX_PATH):
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, patients=self.patients, offsets=self.offsets, rows=self.rows, outcomes=self.outcomes,
+                 prior_encounters=self.prior_encounters, prior_readmissions=self.prior_readmissions,
+                 prior_days=self.prior_days)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        with np.load(path) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+
+def index_version(path=INDEX_PATH):
+    """Return a token that changes whenever the index `load_index` returns changes."""
+    return artifact_version(path)
+
+
+def load_index(path=INDEX_PATH):
+    """Return the patient index, shared by every session of the process.
+
+    The offline-built file is used unless the dataset has been rewritten
+    after it, in which case the index is built from the dataset.
+    """
+    source = artifact_source(path)
+    if source == path:
+        return cached(('patients', os.path.abspath(path)), file_version(path), lambda: PatientIndex.load(path))
+    return cached(('patients', os.path.abspath(source)), dataset_version(source),
+                  lambda: PatientIndex.from_frame(load_dataset(columns=SOURCE_COLUMNS)))
+
+
+def history(patient_nbr, index=None):
+    """Encounters of a patient in the order of their stays, with the history features of each."""
+    index = load_index() if index is None else index
+    features = index.features(patient_nbr)
+    encounters = load_dataset(columns=HISTORY_COLUMNS).iloc[features.index]
+    return pd.concat([encounters.set_axis(features.index), features], axis=1).reset_index(drop=True)
+
+
+def frequent_patients(n=20, path=INDEX_PATH):
+    """Number of encounters of the `n` patients with the most encounters, largest first."""
+    return cached(('frequent_patients', os.path.abspath(path), n), index_version(path),
+                  lambda: load_index(path).encounter_counts().nlargest(n))
+
+
+def _readmission_table(groups, readmitted, labels, name):
+    encounters = np.bincount(groups, minlength=len(labels))
+    table = pd.DataFrame({'encounters': encounters,
+                          'readmitted': np.bincount(groups, weights=readmitted, minlength=len(labels))
+                          .astype(np.int64)},
+                         index=pd.Index(labels, name=name))
+    table['readmission_rate'] = table['readmitted'] / table['encounters'].where(table['encounters'] > 0)
+    return table
+
+
+def readmission_by_prior_encounters(index=None, max_prior=5):
+    """Encounters, readmissions and readmission rate by number of prior encounters (`max_prior` and more pooled)."""
+    index = load_index() if index is None else index
+    known = index.outcomes >= 0
+    labels = [str(n) for n in range(max_prior)] + [f"{max_prior}+"]
+    return _readmission_table(np.minimum(index.prior_encounters[known], max_prior),
+                              (index.outcomes[known] > 0), labels, 'prior_encounters')
+
+
+def readmission_by_previous_outcome(index=None):
+    """Encounters, readmissions and readmission rate by the outcome of the patient's previous encounter.
+
+    Encounters whose previous encounter has no known outcome get a row of
+    their own, left out when there are none.
+    """
+    index = load_index() if index is None else index
+    known = index.outcomes >= 0
+    # Code 0 is a patient's first encounter, 1 an unknown previous outcome, then the codes of OUTCOMES
+    previous = index.previous_outcomes()[known].astype(np.int64)
+    groups = np.where(index.prior_encounters[known] == 0, 0, previous + 2)
+    table = _readmission_table(groups, (index.outcomes[known] > 0),
+                               ['First encounter', f'{UNKNOWN_OUTCOME} previous outcome'] + OUTCOMES,
+                               'previous_outcome')
+    return table[(table['encounters'] > 0) | (table.index != f'{UNKNOWN_OUTCOME} previous outcome')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the patient index of the clean dataset.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    build = subparsers.add_parser('build', help="build the index from the clean dataset")
+    build.add_argument('--data', default=None, help="clean dataset (CSV or Feather)")
+    parser.add_argument('--index', default=INDEX_PATH)
+    args = parser.parse_args()
+
+    index = PatientIndex.from_frame(load_dataset(columns=SOURCE_COLUMNS, path=args.data))
+    index.save(args.index)
+    print(f"{args.index}: {len(index)} patients, {len(index.rows)} encounters")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Streaming version of the cleaning steps in `1_Preprocessing.ipynb`.
+
+The raw extract is read in fixed-size chunks, cleaned with vectorized lookups
+and appended to the clean CSV and Feather snapshot as it goes, so memory use
+is bounded by the chunk size rather than by the size of the extract.
+
+Usage:
+    python -m glucoguard.preprocessing diabetic_data.csv
+"""
+import argparse
+import os
+
+import pandas as pd
+
+from glucoguard.data import DATA_PATH, SNAPSHOT_PATH, SnapshotWriter, apply_dtypes
+from glucoguard.schema import NOMINAL_COLUMNS
+
+RAW_PATH = "diabetic_data.csv"
+CHUNK_SIZE = 100_000
+
+# Features removed because most of their values are missing
+DROPPED_COLUMNS = ['weight', 'payer_code', 'medical_specialty']
+
+# Lookup tables for the lab results; anything else means "Not measured"
+MAX_GLU_SERUM_MAP = {'Norm': 'Normal', '>300': 'High', '>200': 'Elevated'}
+A1C_RESULT_MAP = {'Norm': 'Normal', '>7': 'High', '>8': 'High'}
+
+# Raw text columns, read as strings so every chunk gets the same dtypes
+_TEXT_COLUMNS = NOMINAL_COLUMNS + ['age', 'max_glu_serum', 'A1Cresult'] + DROPPED_COLUMNS
+
+
+def clean_chunk(chunk):
+    """Apply the notebook's cleaning steps to one chunk of the raw dataset."""
+    chunk = chunk.assign(
+        max_glu_serum_transformed=chunk['max_glu_serum'].map(MAX_GLU_SERUM_MAP).fillna('Not measured'),
+        A1Cresult_transformed=chunk['A1Cresult'].map(A1C_RESULT_MAP).fillna('Not measured'),
+    )
+    chunk = chunk.drop(columns=['max_glu_serum', 'A1Cresult'] + DROPPED_COLUMNS)
+
+    # Delete rows that have '?' or missing values
+    text = chunk.select_dtypes(include='object')
+    keep = ~(text == '?').any(axis=1) & chunk.notna().all(axis=1)
+    return apply_dtypes(chunk[keep])
+
+
+def preprocess(raw_path=RAW_PATH, output_path=DATA_PATH, snapshot_path=SNAPSHOT_PATH,
+               chunksize=CHUNK_SIZE):
+    """Clean the raw extract chunk by chunk and write the results incrementally.
+
+    Either output can be skipped by passing None. Returns a summary with the
+    number of rows read and written and the per-column counts of '?' and
+    missing values found in the raw data.
+    """
+    rows_read = rows_written = 0
+    unknown_counts = missing_counts = None
+    # Write the CSV to a temporary file so readers never see a half-written dataset
+    tmp_output = f"{output_path}.tmp" if output_path else None
+    snapshot = SnapshotWriter(snapshot_path) if snapshot_path else None
+    try:
+        reader = pd.read_csv(raw_path, chunksize=chunksize,
+                             dtype={col: str for col in _TEXT_COLUMNS})
+        for chunk in reader:
+            unknown = (chunk.select_dtypes(include='object') == '?').sum()
+            missing = chunk.isna().sum()
+            unknown_counts = unknown if unknown_counts is None else unknown_counts.add(unknown, fill_value=0)
+            missing_counts = missing if missing_counts is None else missing_counts + missing
+
+            clean = clean_chunk(chunk)
+            if tmp_output:
+                clean.to_csv(tmp_output, mode='w' if rows_read == 0 else 'a',
+                             header=rows_read == 0, index=False)
+            if snapshot:
+                snapshot.write(clean)
+            rows_read += len(chunk)
+            rows_written += len(clean)
+    except BaseException:
+        if snapshot:
+            snapshot.abort()
+        if tmp_output and os.path.exists(tmp_output):
+            os.remove(tmp_output)
+        raise
+    if snapshot:
+        snapshot.close()
+    if tmp_output and rows_read:
+        os.replace(tmp_output, output_path)
+
+    return {
+        'rows_read': rows_read,
+        'rows_written': rows_written,
+        'unknown_values': unknown_counts.astype(int),
+        'missing_values': missing_counts.astype(int),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean the raw diabetic_data.csv extract in chunks.")
+    parser.add_argument('raw_path', nargs='?', default=RAW_PATH)
+    parser.add_argument('--output', default=DATA_PATH, help="clean CSV file ('' to skip)")
+    parser.add_argument('--snapshot', default=SNAPSHOT_PATH, help="clean Feather snapshot ('' to skip)")
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    summary = preprocess(args.raw_path, args.output or None, args.snapshot or None, args.chunksize)
+    print("Unknown ('?') values per feature:")
+    print(summary['unknown_values'][summary['unknown_values'] > 0].to_string())
+    print(f"Rows read: {summary['rows_read']}, rows written: {summary['rows_written']}")
+
+
+if __name__ == '__main__':
+    main()
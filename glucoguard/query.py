@@ -0,0 +1,243 @@
+"""Query backends computing the aggregates of the Data Summary and Data Investigation pages.
+
+The pages only draw aggregates: the summary cube, the correlation sufficient
+statistics, the readmission contingency tables and per-group value counts.
+A backend computes them from the clean dataset:
+    pandas  loads the needed columns into memory and aggregates them with
+            the functions of `cube`, `correlation`, `association` and
+            `summaries` (fastest for the original dataset);
+    duckdb  pushes every aggregate down as a single SQL query, run by DuckDB
+            over the Feather snapshot (or the CSV file) on all cores,
+            streaming the file instead of loading it and spilling to disk
+            when the aggregation state does not fit in memory.
+Both return the same results, so the page code does not depend on the
+backend. DuckDB is optional (`pip install duckdb`); by default ('auto') it is
+used for datasets of at least `AUTO_MIN_BYTES` when it is installed. The
+`GLUCOGUARD_QUERY_BACKEND` environment variable forces a backend.
+
+Usage (times every aggregate with each backend and checks that they agree):
+    python -m glucoguard.query [--backends pandas duckdb] [--data diabetes_clean.feather]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from glucoguard.data import apply_dtypes, dataset_path, load_dataset
+from glucoguard.schema import AGE_MIDPOINTS, MEDICATION_GROUPS, PHARM_GROUPS
+
+BACKEND_ENV = 'GLUCOGUARD_QUERY_BACKEND'
+BACKENDS = ['auto', 'pandas', 'duckdb']
+# Datasets from this size on are queried with DuckDB in 'auto' mode (about 1M encounters)
+AUTO_MIN_BYTES = 256 * 2 ** 20
+# Where DuckDB spills aggregation state that does not fit in memory
+SPILL_DIR = os.environ.get('GLUCOGUARD_DUCKDB_TEMP', os.path.join(tempfile.gettempdir(), 'glucoguard-duckdb'))
+
+
+class PandasBackend:
+    """Aggregates of the dataset loaded (and shared) in memory."""
+
+    name = 'pandas'
+
+    def __init__(self, path=None):
+        self.path = path
+
+    def cube(self):
+        from glucoguard import cube
+
+        return cube.build_cube(load_dataset(columns=cube.SOURCE_COLUMNS, path=self.path))
+
+    def correlation_stats(self):
+        from glucoguard import correlation
+
+        return correlation.CorrelationStats.from_frame(
+            load_dataset(columns=correlation.SOURCE_COLUMNS, path=self.path))
+
+    def readmission_associations(self, features):
+        from glucoguard import association
+
+        return association.readmission_associations(
+            load_dataset(columns=list(features) + ['readmitted'], path=self.path), features)
+
+    def group_value_counts(self, column, groups):
+        from glucoguard.medications import load_medication_bits
+        from glucoguard.summaries import group_value_counts
+
+        return group_value_counts(load_dataset(columns=[column], path=self.path)[column],
+                                  load_medication_bits(self.path), groups)
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _prescribed(med):
+    # Like `medications._prescribed`: anything but 'No', and missing is not prescribed
+    return f"coalesce({_quote(med)} <> 'No', false)"
+
+
+def _uses(name):
+    """SQL condition of an encounter receiving medication or pharmacological group `name`."""
+    return ' OR '.join(_prescribed(med) for med in MEDICATION_GROUPS.get(name, [name]))
+
+
+class DuckDBBackend:
+    """Aggregates pushed down as SQL queries run by DuckDB over the dataset file."""
+
+    name = 'duckdb'
+
+    def __init__(self, path=None, threads=None):
+        self.path = dataset_path(path)
+        self.threads = threads or os.cpu_count()
+
+    def _query(self, sql):
+        """Run `sql`, where `encounters` is the dataset, and return the result as a frame.
+
+        Every query gets its own in-memory database, since a DuckDB connection
+        must not be shared by the threads of concurrent sessions.
+        """
+        import duckdb
+
+        os.makedirs(SPILL_DIR, exist_ok=True)
+        with duckdb.connect(config={'threads': self.threads, 'temp_directory': SPILL_DIR}) as connection:
+            if self.path.endswith('.feather'):
+                import pyarrow.dataset
+
+                # Scanned in batches, reading only the columns the query uses
+                connection.register('encounters', pyarrow.dataset.dataset(self.path, format='ipc'))
+            else:
+                connection.read_csv(self.path, header=True).create_view('encounters')
+            return connection.execute(sql).df()
+
+    def cube(self):
+        from glucoguard.cube import DIMENSIONS, MEASURES
+
+        flags = ', '.join(f"CAST({_uses(group)} AS UTINYINT) AS {_quote(group)}" for group in PHARM_GROUPS)
+        dimensions = ', '.join(_quote(dim) for dim in DIMENSIONS)
+        result = self._query(f"""
+            SELECT {dimensions},
+                   count(*) AS count,
+                   sum(time_in_hospital) AS time_in_hospital_sum,
+                   sum(time_in_hospital * time_in_hospital) AS time_in_hospital_sumsq
+            FROM (SELECT age, race, gender, readmitted, change,
+                         CAST(time_in_hospital AS BIGINT) AS time_in_hospital, {flags}
+                  FROM encounters)
+            GROUP BY ALL
+        """)
+        result = result.astype({**{group: np.uint8 for group in PHARM_GROUPS},
+                                **{measure: np.int64 for measure in MEASURES}})
+        return apply_dtypes(result.astype({dim: str for dim in DIMENSIONS[:5]}))
+
+    def correlation_stats(self):
+        from glucoguard.correlation import FEATURES, MEDICATION_FEATURES, CorrelationStats
+
+        ages = ' '.join(f"WHEN '{age}' THEN {midpoint}" for age, midpoint in AGE_MIDPOINTS.items())
+        encoded = {
+            'age': f"CAST(CASE age {ages} END AS DOUBLE)",
+            'gender': "CAST(gender IS NOT DISTINCT FROM 'Male' AS DOUBLE)",
+        }
+        encoded['change'] = "CAST(change IS DISTINCT FROM 'No' AS DOUBLE)"
+        for med in MEDICATION_FEATURES:
+            encoded[med] = f"CAST({_uses(med)} AS DOUBLE)"
+        encoded['readmitted'] = "CAST(readmitted IS DISTINCT FROM 'NO' AS DOUBLE)"
+        columns = [f"{encoded.get(col, f'CAST({_quote(col)} AS DOUBLE)')} AS f{i}" for i, col in enumerate(FEATURES)]
+        k = len(FEATURES)
+        pairs = [(i, j) for i in range(k) for j in range(i, k)]
+        sums = [f"sum(f{i})" for i in range(k)] + [f"sum(f{i} * f{j})" for i, j in pairs]
+        row = self._query(f"SELECT count(*), {', '.join(sums)} FROM (SELECT {', '.join(columns)} FROM encounters)")
+        values = row.iloc[0].to_numpy(dtype=np.float64)
+        cross = np.zeros((k, k))
+        for (i, j), value in zip(pairs, values[1 + k:]):
+            cross[i, j] = cross[j, i] = value
+        return CorrelationStats(values[0], values[1:1 + k], cross)
+
+    def readmission_associations(self, features):
+        from glucoguard.association import chi_square
+
+        # One scan: every feature is unpivoted into (feature, value) pairs, missing values dropped
+        casts = ', '.join(f"CAST({_quote(feature)} AS VARCHAR) AS {_quote(feature)}" for feature in features)
+        counts = self._query(f"""
+            SELECT feature, value, readmitted, count(*) AS count
+            FROM (UNPIVOT (SELECT {casts},
+                                  CASE WHEN readmitted IS NOT DISTINCT FROM 'NO' THEN 'No' ELSE 'Yes' END
+                                      AS readmitted
+                           FROM encounters)
+                  ON COLUMNS(* EXCLUDE (readmitted)) INTO NAME feature VALUE value)
+            GROUP BY ALL
+        """)
+        tables = {}
+        for feature in features:
+            part = counts[counts['feature'] == feature]
+            table = part.pivot_table(index='value', columns='readmitted', values='count', aggfunc='sum', fill_value=0)
+            tables[feature] = table.reindex(columns=sorted(table.columns)).to_numpy(dtype=np.int64)
+        return chi_square(tables)
+
+    def group_value_counts(self, column, groups):
+        counts = ', '.join(f"count(*) FILTER ({_uses(group)}) AS {_quote(group)}" for group in groups)
+        result = self._query(f"SELECT {_quote(column)} AS value, {counts} FROM encounters GROUP BY ALL ORDER BY value")
+        return result.set_index('value')[list(groups)].astype(np.int64).rename_axis(None).T
+
+
+def backend_name(path=None):
+    """Return the backend that `backend()` picks for the dataset at `path`."""
+    name = os.environ.get(BACKEND_ENV, 'auto')
+    if name not in BACKENDS:
+        raise ValueError(f"{BACKEND_ENV} must be one of {BACKENDS}, not {name!r}")
+    if name != 'auto':
+        return name
+    try:
+        import duckdb  # noqa: F401
+    except ImportError:
+        return 'pandas'
+    return 'duckdb' if os.path.getsize(dataset_path(path)) >= AUTO_MIN_BYTES else 'pandas'
+
+
+def backend(path=None, name=None):
+    """Return the query backend `name` (by default, see `backend_name`) for the dataset at `path`."""
+    name = name or backend_name(path)
+    return DuckDBBackend(path) if name == 'duckdb' else PandasBackend(path)
+
+
+def _difference(a, b):
+    """Largest absolute difference between two results of the same aggregate."""
+    from glucoguard.correlation import CorrelationStats
+
+    if isinstance(a, CorrelationStats):
+        return max(abs(a.n - b.n), np.abs(a.sums - b.sums).max(), np.abs(a.cross - b.cross).max())
+    if 'count' in a.columns:
+        # Cube cells come in no particular order
+        keys = [col for col in a.columns if not col.startswith(('count', 'time_in_hospital'))]
+        a, b = (frame.astype({key: str for key in keys}).set_index(keys).sort_index() for frame in (a, b))
+    a, b = a.align(b)
+    return float(np.nanmax(np.abs(a.to_numpy(dtype=np.float64) - b.to_numpy(dtype=np.float64))))
+
+
+def main():
+    from glucoguard.association import CATEGORICAL_FEATURES
+
+    parser = argparse.ArgumentParser(description="Time the page aggregates with each query backend.")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS[1:], default=BACKENDS[1:])
+    parser.add_argument('--data', default=None, help="clean dataset (CSV or Feather)")
+    args = parser.parse_args()
+
+    aggregates = {
+        'cube': lambda engine: engine.cube(),
+        'correlation_stats': lambda engine: engine.correlation_stats(),
+        'readmission_associations': lambda engine: engine.readmission_associations(CATEGORICAL_FEATURES),
+        'group_value_counts': lambda engine: engine.group_value_counts('time_in_hospital', PHARM_GROUPS),
+    }
+    for aggregate, compute in aggregates.items():
+        results = {}
+        for name in args.backends:
+            start = time.perf_counter()
+            results[name] = compute(backend(args.data, name))
+            print(f"{aggregate:<26} {name:<7} {time.perf_counter() - start:8.3f} s")
+        first, *others = results.values()
+        for name, result in zip(args.backends[1:], others):
+            print(f"{aggregate:<26} max difference {args.backends[0]} vs {name}: {_difference(first, result):.3g}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""Column names and category orders of the clean diabetes dataset."""
+
+# Ordered categories built by `1_Preprocessing.ipynb`
+AGE_ORDER = ['[0-10)', '[10-20)', '[20-30)', '[30-40)', '[40-50)',
+             '[50-60)', '[60-70)', '[70-80)', '[80-90)', '[90-100)']
+MAX_GLU_ORDER = ['Not measured', 'Normal', 'Elevated', 'High']
+A1C_ORDER = ['Not measured', 'Normal', 'High']
+
+# Midpoint (in years) of every age bin
+AGE_MIDPOINTS = {age: 10 * i + 5 for i, age in enumerate(AGE_ORDER)}
+
+ORDINAL_CATEGORIES = {
+    'age': AGE_ORDER,
+    'max_glu_serum_transformed': MAX_GLU_ORDER,
+    'A1Cresult_transformed': A1C_ORDER,
+}
+
+MEDICATIONS = ['metformin', 'repaglinide', 'nateglinide', 'chlorpropamide', 'glimepiride',
+               'acetohexamide', 'glipizide', 'glyburide', 'tolbutamide', 'pioglitazone',
+               'rosiglitazone', 'acarbose', 'miglitol', 'troglitazone', 'tolazamide',
+               'examide', 'citoglipton', 'insulin', 'glyburide-metformin',
+               'glipizide-metformin', 'glimepiride-pioglitazone',
+               'metformin-rosiglitazone', 'metformin-pioglitazone']
+
+# Nominal columns stored as (unordered) categoricals
+NOMINAL_COLUMNS = ['race', 'gender', 'diag_1', 'diag_2', 'diag_3'] + MEDICATIONS + \
+                  ['change', 'diabetesMed', 'readmitted']
+
+# Pharmacological groups of the individual medications
+MEDICATION_GROUPS = {
+    'SU': ['chlorpropamide', 'glimepiride', 'acetohexamide', 'glipizide',
+           'glyburide', 'tolbutamide', 'tolazamide'],
+    'meglitinides': ['repaglinide', 'nateglinide'],
+    'thiazolidinediones': ['pioglitazone', 'rosiglitazone', 'troglitazone'],
+    'glucosidase_inh': ['acarbose', 'miglitol'],
+}
+
+# Groups shown on the dashboard: the four classes above plus metformin and insulin
+PHARM_GROUPS = list(MEDICATION_GROUPS) + ['metformin', 'insulin']
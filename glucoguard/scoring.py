@@ -0,0 +1,40 @@
+"""Batch readmission scoring for cohorts in the clean dataset schema."""
+import numpy as np
+import pandas as pd
+
+from glucoguard.features import SOURCE_COLUMNS
+
+CHUNK_SIZE = 50_000
+
+# Columns copied from the cohort to the results to identify each row
+ID_COLUMNS = ['encounter_id', 'patient_nbr']
+
+
+def read_cohort(file, name):
+    """Read an uploaded cohort from a CSV or Parquet file (ValueError if a model input column is missing)."""
+    if name.lower().endswith('.parquet'):
+        df = pd.read_parquet(file)
+    else:
+        df = pd.read_csv(file)
+    missing = [col for col in SOURCE_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"The cohort is missing the columns {', '.join(missing)}")
+    return df
+
+
+def score(df, pipeline, chunksize=CHUNK_SIZE):
+    """Return the readmission probability and prediction for every row of `df`.
+
+    Rows are encoded and scored `chunksize` at a time with the inference
+    `pipeline`, so the size of the intermediate feature matrices does not
+    grow with the cohort.
+    """
+    probabilities = np.empty(len(df), dtype=np.float64)
+    for start in range(0, len(df), chunksize):
+        chunk = df.iloc[start:start + chunksize]
+        probabilities[start:start + chunksize] = pipeline.predict_proba(pipeline.features(chunk))
+
+    results = df[[col for col in ID_COLUMNS if col in df.columns]].copy()
+    results['readmission_probability'] = probabilities
+    results['predicted_readmission'] = (probabilities > 0.5).astype(np.uint8)
+    return results
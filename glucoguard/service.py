@@ -0,0 +1,212 @@
+"""Local prediction service for the readmission model.
+
+A single process owns one copy of the inference pipeline and serves it over
+HTTP. Concurrent single-row requests are gathered into micro-batches: the
+first request of a batch waits at most `max_wait` seconds for others to
+arrive, and the whole batch is scored with one call into the model.
+
+Endpoints (JSON in, JSON out):
+    GET  /health   model version, feature order and batching statistics
+    POST /predict  {"features": {name: value}} -> probability and prediction
+    POST /explain  {"features": {name: value}} -> SHAP values of the row
+
+Features are the encoded, unscaled model features (see
+`glucoguard.features.FEATURE_COLUMNS`); the service scales them itself.
+
+Usage:
+    python -m glucoguard.service --port 8765
+    GLUCOGUARD_SERVICE_URL=http://localhost:8765 streamlit run Dashboard.py
+"""
+import argparse
+import asyncio
+import json
+import logging
+import urllib.request
+
+import numpy as np
+import tornado.web
+
+from glucoguard.explain import load_explainer
+from glucoguard.inference import ARTIFACT_PATH, load_pipeline
+from glucoguard.trees import load_forest
+
+logger = logging.getLogger(__name__)
+
+# Environment variable read by the prediction page to use the service
+SERVICE_URL_ENV = 'GLUCOGUARD_SERVICE_URL'
+
+PORT = 8765
+MAX_BATCH = 256
+MAX_WAIT = 0.005
+
+
+class MicroBatcher:
+    """Queue single rows and evaluate them in batches with `fn`.
+
+    `fn` receives a 2-d array with one row per request and returns one result
+    per row. Batches are evaluated one at a time in a worker thread, so the
+    event loop keeps accepting requests while the model runs.
+    """
+
+    def __init__(self, fn, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.fn = fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self.rows = 0
+        self._queue = asyncio.Queue()
+
+    async def submit(self, row):
+        """Return the result of `fn` for `row`, once its batch has been evaluated."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            rows = np.vstack([row for row, _ in batch])
+            try:
+                results = await loop.run_in_executor(None, self.fn, rows)
+            except Exception as exc:
+                logger.exception("Batch of %d rows failed", len(batch))
+                results = None
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+            self.batches += 1
+            self.rows += len(batch)
+            if results is None:
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+class _Handler(tornado.web.RequestHandler):
+    def initialize(self, pipeline, batcher=None):
+        self.pipeline = pipeline
+        self.batcher = batcher
+
+    def _row(self):
+        try:
+            features = json.loads(self.request.body)['features']
+            return np.array([float(features[col]) for col in self.pipeline.feature_columns])
+        except (ValueError, KeyError, TypeError) as exc:
+            raise tornado.web.HTTPError(400, reason=f"Invalid features: {exc}")
+
+
+class HealthHandler(_Handler):
+    def get(self):
+        self.write({
+            'model_version': self.pipeline.version,
+            'feature_columns': self.pipeline.feature_columns,
+            'batches': self.batcher.batches,
+            'rows': self.batcher.rows,
+        })
+
+
+class PredictHandler(_Handler):
+    async def post(self):
+        probability = float(await self.batcher.submit(self._row()))
+        self.write({
+            'model_version': self.pipeline.version,
+            'probability': probability,
+            'prediction': int(probability > 0.5),
+        })
+
+
+class ExplainHandler(_Handler):
+    def initialize(self, pipeline, batcher=None, base_value=None):
+        super().initialize(pipeline, batcher)
+        self.base_value = base_value
+
+    async def post(self):
+        values = await self.batcher.submit(self._row())
+        self.write({
+            'model_version': self.pipeline.version,
+            'base_value': self.base_value,
+            'shap_values': dict(zip(self.pipeline.feature_columns, map(float, values))),
+        })
+
+
+def make_app(pipeline, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+    """Return the Tornado application and the batchers to run alongside it."""
+    explainer = load_explainer(pipeline)
+    predictions = MicroBatcher(load_forest(pipeline).predict_proba, max_batch, max_wait)
+    explanations = MicroBatcher(explainer.explain_rows, max_batch, max_wait)
+    app = tornado.web.Application([
+        (r'/health', HealthHandler, {'pipeline': pipeline, 'batcher': predictions}),
+        (r'/predict', PredictHandler, {'pipeline': pipeline, 'batcher': predictions}),
+        (r'/explain', ExplainHandler, {'pipeline': pipeline, 'batcher': explanations,
+                                       'base_value': explainer.base_value}),
+    ])
+    return app, [predictions, explanations]
+
+
+async def serve(pipeline, host='localhost', port=PORT, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+    app, batchers = make_app(pipeline, max_batch, max_wait)
+    app.listen(port, address=host)
+    logger.info("Serving model %s on http://%s:%d", pipeline.version, host, port)
+    await asyncio.gather(*(batcher.run() for batcher in batchers))
+
+
+class ServiceClient:
+    """Minimal client of a running prediction service."""
+
+    def __init__(self, url, timeout=10):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, endpoint, payload=None):
+        data = None if payload is None else json.dumps(payload).encode()
+        request = urllib.request.Request(f"{self.url}{endpoint}", data=data,
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.load(response)
+
+    def info(self):
+        return self._request('/health')
+
+    def predict(self, features):
+        """Return the readmission probability of one row of encoded features."""
+        return self._request('/predict', {'features': {k: float(v) for k, v in features.items()}})['probability']
+
+    def explain(self, features):
+        """Return the base value and the SHAP values (in feature order) of one row."""
+        result = self._request('/explain', {'features': {k: float(v) for k, v in features.items()}})
+        return result['base_value'], np.array(list(result['shap_values'].values()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the readmission model over HTTP.")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--artifact', default=ARTIFACT_PATH)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help="largest micro-batch")
+    parser.add_argument('--max-wait', type=float, default=MAX_WAIT * 1000,
+                        help="longest wait for a micro-batch to fill, in milliseconds")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    pipeline = load_pipeline(args.artifact)
+    asyncio.run(serve(pipeline, args.host, args.port, args.max_batch, args.max_wait / 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Distribution summaries computed from value counts instead of raw rows.
+
+The Data Summary charts plot discrete values (age bins, days in hospital),
+so each distribution is fully described by the count of every distinct
+value. Quantiles, box-plot whiskers, KDE curves and histogram bars are
+computed here from those counts, and the browser only receives the summary,
+whose size does not depend on the number of encounters.
+"""
+import numpy as np
+import pandas as pd
+
+from glucoguard.data import cached, dataset_version
+from glucoguard.medications import uses
+
+
+def _sorted_counts(values, counts):
+    values = np.asarray(values, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.int64)
+    order = np.argsort(values)
+    keep = counts[order] > 0
+    return values[order][keep], counts[order][keep]
+
+
+def weighted_quantile(values, counts, q):
+    """Quantile `q` of the data where `values[i]` occurs `counts[i]` times.
+
+    Uses linear interpolation between order statistics, like `np.quantile`
+    (and Plotly's default box plot quartiles) on the expanded data.
+    """
+    values, counts = _sorted_counts(values, counts)
+    ends = np.cumsum(counts)
+    position = (ends[-1] - 1) * np.asarray(q, dtype=np.float64)
+    lower = np.floor(position)
+    below = values[np.searchsorted(ends, lower, side='right')]
+    above = values[np.searchsorted(ends, np.minimum(lower + 1, ends[-1] - 1), side='right')]
+    return below + (above - below) * (position - lower)
+
+
+def box_stats(values, counts):
+    """Quartiles, mean, whiskers (1.5 IQR rule) and distinct outlier values; None when all counts are 0."""
+    values, counts = _sorted_counts(values, counts)
+    if not len(values):
+        return None
+    q1, median, q3 = weighted_quantile(values, counts, [0.25, 0.5, 0.75])
+    iqr = q3 - q1
+    inside = (values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)
+    return {
+        'q1': q1,
+        'median': median,
+        'q3': q3,
+        'mean': np.average(values, weights=counts),
+        'lowerfence': values[inside].min(),
+        'upperfence': values[inside].max(),
+        'outliers': values[~inside],
+        'count': int(counts.sum()),
+    }
+
+
+def bandwidth(values, counts, rule='scott'):
+    """Gaussian kernel bandwidth of the expanded data.
+
+    'scott' matches `scipy.stats.gaussian_kde` (used by seaborn) and
+    'silverman' matches the rule of thumb of Plotly violins.
+    """
+    values, counts = _sorted_counts(values, counts)
+    n = counts.sum()
+    if n < 2:
+        # A single encounter has no spread
+        return 0.0
+    mean = np.average(values, weights=counts)
+    std = np.sqrt(np.sum(counts * (values - mean) ** 2) / (n - 1))
+    if rule == 'scott':
+        return std * n ** -0.2
+    q1, q3 = weighted_quantile(values, counts, [0.25, 0.75])
+    spread = min(std, (q3 - q1) / 1.349) or std
+    return 1.059 * spread * n ** -0.2
+
+
+def kde(values, counts, grid, bw=None):
+    """Gaussian KDE of the expanded data evaluated on `grid` (integrates to 1)."""
+    values, counts = _sorted_counts(values, counts)
+    bw = bandwidth(values, counts) if bw is None else bw
+    if not bw > 0:
+        # A single distinct value has no spread; draw a unit-width bump
+        bw = 1.0
+    z = (np.asarray(grid, dtype=np.float64)[:, None] - values[None, :]) / bw
+    return (np.exp(-0.5 * z ** 2) @ counts) / (counts.sum() * bw * np.sqrt(2 * np.pi))
+
+
+def group_value_counts(values, bits, groups):
+    """Count each distinct value of `values` among the encounters of every group.
+
+    Returns a (groups x distinct values) frame of counts.
+    """
+    distinct, codes = np.unique(np.asarray(values), return_inverse=True)
+    counts = {group: np.bincount(codes[uses(bits, group)], minlength=len(distinct)) for group in groups}
+    return pd.DataFrame(counts, index=distinct).T
+
+
+def load_group_value_counts(column, groups, path=None):
+    """`group_value_counts` of a dataset column, computed once per dataset version."""
+    from glucoguard.query import backend
+
+    return cached(('group_value_counts', column, tuple(groups), path), dataset_version(path),
+                  lambda: backend(path).group_value_counts(column, groups))
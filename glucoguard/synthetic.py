@@ -0,0 +1,235 @@
+"""Synthetic encounters in the clean dataset schema, for scale and load testing.
+
+`EncounterModel.fit` learns, from the clean dataset:
+    - the joint distribution of age, race, gender and readmission;
+    - given the readmission class: the joint distribution of the three
+      admission ids, of the two lab results and of the 23 medications together
+      with `change` and `diabetesMed` (so co-prescriptions stay consistent),
+      and the distribution of each of `diag_1`, `diag_2` and `diag_3`;
+    - given the readmission class: a Gaussian copula of the numeric counts,
+      which keeps their empirical marginals and rank correlations.
+Every categorical block is sampled from the combinations seen in the data,
+with their observed frequencies.
+
+Rows are generated in chunks, each from its own random generator seeded with
+(seed, chunk number), so the output is reproducible for a given seed and
+chunk size and memory use is bounded by the chunk size. The CSV file (through
+Arrow's CSV writer, a few times faster than `DataFrame.to_csv`) and the
+Feather snapshot are written incrementally and moved into place at the end.
+
+Usage (then run the dashboard from the repository root on the result with
+`GLUCOGUARD_DATASET=synthetic/diabetes_clean.feather streamlit run Dashboard.py`):
+    python -m glucoguard.synthetic 10000000 --output synthetic/diabetes_clean.csv \\
+        --snapshot synthetic/diabetes_clean.feather
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from glucoguard.data import SnapshotWriter, load_dataset
+from glucoguard.schema import MEDICATIONS
+
+CHUNK_SIZE = 500_000
+
+TARGET = 'readmitted'
+DEMOGRAPHICS = ['age', 'race', 'gender', TARGET]
+# Blocks of categorical columns sampled jointly, given the readmission class
+CONDITIONAL_BLOCKS = [
+    ['admission_type_id', 'discharge_disposition_id', 'admission_source_id'],
+    ['max_glu_serum_transformed', 'A1Cresult_transformed'],
+    MEDICATIONS + ['change', 'diabetesMed'],
+    ['diag_1'],
+    ['diag_2'],
+    ['diag_3'],
+]
+NUMERIC_COLUMNS = ['time_in_hospital', 'num_lab_procedures', 'num_procedures', 'num_medications',
+                   'number_outpatient', 'number_emergency', 'number_inpatient', 'number_diagnoses']
+ID_COLUMNS = ['encounter_id', 'patient_nbr']
+
+
+class _Joint:
+    """Observed combinations of a block of columns and their frequencies."""
+
+    def __init__(self, frame, columns):
+        self.columns = columns
+        codes, self.values = [], []
+        for col in columns:
+            column_codes, uniques = pd.factorize(frame[col], sort=True)
+            codes.append(column_codes)
+            self.values.append(np.asarray(uniques))
+        self.combinations, counts = np.unique(np.column_stack(codes), axis=0, return_counts=True)
+        self.cumulative = np.cumsum(counts) / counts.sum()
+
+    def sample(self, n, rng):
+        """Return {column: values} of `n` combinations drawn with their observed frequencies."""
+        picked = self.combinations[np.searchsorted(self.cumulative, rng.random(n), side='right')
+                                   .clip(max=len(self.combinations) - 1)]
+        return {col: values[picked[:, i]] for i, (col, values) in enumerate(zip(self.columns, self.values))}
+
+
+class _Copula:
+    """Gaussian copula of numeric columns with their empirical marginals."""
+
+    def __init__(self, frame, columns):
+        from scipy.special import ndtri
+
+        self.columns = columns
+        self.values, self.cumulative = [], []
+        scores = []
+        for col in columns:
+            values, counts = np.unique(frame[col].to_numpy(), return_counts=True)
+            self.values.append(values)
+            self.cumulative.append(np.cumsum(counts) / counts.sum())
+            ranks = frame[col].rank(method='average').to_numpy()
+            scores.append(ndtri((ranks - 0.5) / len(ranks)))
+        correlation = np.corrcoef(np.column_stack(scores), rowvar=False) if len(frame) > 1 else np.eye(len(columns))
+        correlation = np.nan_to_num(correlation, nan=0.0)
+        np.fill_diagonal(correlation, 1.0)
+        # A small ridge keeps the matrix positive definite when columns are constant or collinear
+        self.factor = np.linalg.cholesky(correlation + 1e-9 * np.eye(len(columns)))
+
+    def sample(self, n, rng):
+        from scipy.special import ndtr
+
+        uniform = ndtr(rng.standard_normal((n, len(self.columns))) @ self.factor.T)
+        return {col: values[np.searchsorted(cumulative, uniform[:, i], side='right').clip(max=len(values) - 1)]
+                for i, (col, values, cumulative) in enumerate(zip(self.columns, self.values, self.cumulative))}
+
+
+class EncounterModel:
+    """Distributions of the clean dataset that synthetic encounters are drawn from."""
+
+    def __init__(self, columns, demographics, conditional, numeric, encounters_per_patient):
+        self.columns = columns
+        self.demographics = demographics
+        self.conditional = conditional
+        self.numeric = numeric
+        self.encounters_per_patient = encounters_per_patient
+
+    @classmethod
+    def fit(cls, df):
+        """Learn the distributions from a frame in the clean dataset schema."""
+        modelled = ID_COLUMNS + DEMOGRAPHICS + sum(CONDITIONAL_BLOCKS, []) + NUMERIC_COLUMNS
+        missing = sorted(set(df.columns) - set(modelled))
+        if missing:
+            raise ValueError(f"No synthetic model for the columns {missing}")
+        classes = df[TARGET].astype(str)
+        conditional, numeric = {}, {}
+        for value, part in df.groupby(classes, sort=True):
+            conditional[value] = [_Joint(part, block) for block in CONDITIONAL_BLOCKS]
+            numeric[value] = _Copula(part, NUMERIC_COLUMNS)
+        return cls(
+            columns=list(df.columns),
+            demographics=_Joint(df, DEMOGRAPHICS),
+            conditional=conditional,
+            numeric=numeric,
+            encounters_per_patient=len(df) / max(df['patient_nbr'].nunique(), 1),
+        )
+
+    def sample(self, n, rng, first_id=1, n_patients=None):
+        """Return `n` synthetic encounters with ids `first_id`, `first_id + 1`, ..."""
+        columns = self.demographics.sample(n, rng)
+        classes = columns[TARGET].astype(str)
+        for value in self.conditional:
+            rows = np.flatnonzero(classes == value)
+            if not len(rows):
+                continue
+            for block in self.conditional[value] + [self.numeric[value]]:
+                for col, values in block.sample(len(rows), rng).items():
+                    if col not in columns:
+                        columns[col] = np.empty(n, dtype=values.dtype)
+                    columns[col][rows] = values
+        n_patients = n_patients or max(int(n / self.encounters_per_patient), 1)
+        columns['encounter_id'] = np.arange(first_id, first_id + n, dtype=np.int64)
+        columns['patient_nbr'] = rng.integers(1, n_patients + 1, size=n, dtype=np.int64)
+        return pd.DataFrame({col: columns[col] for col in self.columns})
+
+    def chunks(self, rows, seed=0, chunksize=CHUNK_SIZE):
+        """Yield `rows` synthetic encounters in frames of at most `chunksize` rows."""
+        n_patients = max(int(rows / self.encounters_per_patient), 1)
+        for number, start in enumerate(range(0, rows, chunksize)):
+            rng = np.random.default_rng([seed, number])
+            yield self.sample(min(chunksize, rows - start), rng, first_id=start + 1, n_patients=n_patients)
+
+
+class _CSVWriter:
+    """Append frames to a CSV file with Arrow; reads back like `to_csv(index=False)` output.
+
+    Arrow quotes every string value, which CSV readers undo.
+    """
+
+    def __init__(self, path, columns):
+        self._file = open(path, 'wb')
+        # A plain header, as the other CSV files of the repository have
+        self._file.write((','.join(columns) + '\n').encode())
+        self._writer = self._schema = None
+
+    def write(self, df):
+        import pyarrow as pa
+        from pyarrow import csv
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            options = csv.WriteOptions(include_header=False, quoting_style='needed')
+            self._schema = table.schema
+            self._writer = csv.CSVWriter(self._file, self._schema, write_options=options)
+        self._writer.write_table(table.cast(self._schema))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._file.close()
+
+
+def generate(model, rows, output_path=None, snapshot_path=None, seed=0, chunksize=CHUNK_SIZE):
+    """Write `rows` synthetic encounters to a CSV file and/or a Feather snapshot, chunk by chunk."""
+    for path in (output_path, snapshot_path):
+        if path:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_output = f"{output_path}.tmp" if output_path else None
+    output = _CSVWriter(tmp_output, model.columns) if tmp_output else None
+    snapshot = SnapshotWriter(snapshot_path) if snapshot_path else None
+    written = 0
+    try:
+        for chunk in model.chunks(rows, seed, chunksize):
+            if output:
+                output.write(chunk)
+            if snapshot:
+                snapshot.write(chunk)
+            written += len(chunk)
+    except BaseException:
+        if snapshot:
+            snapshot.abort()
+        if output:
+            output.close()
+            os.remove(tmp_output)
+        raise
+    if snapshot:
+        snapshot.close()
+    if output:
+        output.close()
+        os.replace(tmp_output, output_path)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic encounters in the clean dataset schema.")
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--data', default=None, help="clean dataset to learn from (CSV or Feather)")
+    parser.add_argument('--output', default="diabetes_synthetic.csv", help="CSV file ('' to skip)")
+    parser.add_argument('--snapshot', default="diabetes_synthetic.feather", help="Feather snapshot ('' to skip)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    model = EncounterModel.fit(load_dataset(path=args.data))
+    written = generate(model, args.rows, args.output or None, args.snapshot or None, args.seed, args.chunksize)
+    print(f"Wrote {written} encounters in {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""Cross-validated model selection of the readmission classifiers.
+
+Every (classifier, fold) pair is an independent task run in a process pool,
+on the features of the whole clean dataset. Each worker loads the data once
+and limits its BLAS/OpenMP threads so that the workers do not oversubscribe
+the cores. Within a fold the min-max scaler is fitted on the training part
+only.
+
+Finished tasks are appended to a JSON-lines results file as they complete.
+A task whose key (classifier, parameters, fold, number of folds, seed,
+dataset version and scoring version) is already in the file is not run again, so an interrupted
+run resumes where it stopped.
+
+Precision, recall and F1 are macro averages over the two classes, as in
+the notebook's former grid search (`make_scorer(f1_score, average='macro')`),
+so the model is selected by the same F1.
+
+Usage:
+    python -m glucoguard.training run [--models HGB RF30] [--folds 5] [--jobs 8]
+    python -m glucoguard.training grid HGB --param max_iter=100,200 --param max_depth=10,20
+    python -m glucoguard.training report
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from glucoguard.data import dataset_version, load_dataset
+from glucoguard.features import SOURCE_COLUMNS, build_features
+
+RESULTS_PATH = "training_results.jsonl"
+RANDOM_SEED = 2023
+
+METRICS = ['accuracy', 'precision', 'recall', 'f1', 'roc_auc']
+# Average of precision, recall and F1 over the two classes
+AVERAGE = 'macro'
+# Bump when the metrics change, so that records computed the old way are not reused
+SCORING = 'macro/1'
+
+# Classifier zoo of `5_Predictive_analysis.ipynb`: name -> (estimator class path, parameters)
+MODELS = {
+    'DT3': ('sklearn.tree.DecisionTreeClassifier', {'max_depth': 3, 'random_state': RANDOM_SEED}),
+    'DT30': ('sklearn.tree.DecisionTreeClassifier', {'max_depth': 30, 'random_state': RANDOM_SEED}),
+    'RF3': ('sklearn.ensemble.RandomForestClassifier',
+            {'n_estimators': 100, 'max_depth': 3, 'random_state': RANDOM_SEED}),
+    'RF30': ('sklearn.ensemble.RandomForestClassifier',
+             {'n_estimators': 100, 'max_depth': 30, 'random_state': RANDOM_SEED}),
+    'KNN3': ('sklearn.neighbors.KNeighborsClassifier', {'n_neighbors': 3}),
+    'KNN25': ('sklearn.neighbors.KNeighborsClassifier', {'n_neighbors': 25}),
+    'SVM_linear': ('sklearn.svm.SVC', {'kernel': 'linear'}),
+    'SGD': ('sklearn.linear_model.SGDClassifier', {'loss': 'modified_huber', 'random_state': RANDOM_SEED}),
+    'GNB': ('sklearn.naive_bayes.GaussianNB', {}),
+    'HGB': ('sklearn.ensemble.HistGradientBoostingClassifier', {'random_state': RANDOM_SEED}),
+    'MLP_2lay': ('sklearn.neural_network.MLPClassifier',
+                 {'hidden_layer_sizes': (200, 200), 'random_state': RANDOM_SEED}),
+}
+
+# Set in each worker by `_init_worker`
+_data = None
+
+
+def training_data(path=None):
+    """Return the encoded (unscaled) features and the binary readmission target of the dataset."""
+    df = load_dataset(columns=SOURCE_COLUMNS + ['readmitted'], path=path)
+    features = build_features(df).to_numpy(dtype=np.float64)
+    target = (df['readmitted'] != 'NO').to_numpy(dtype=np.int64)
+    return features, target
+
+
+def grid(name, param_grid):
+    """Expand the parameter grid of `MODELS[name]` into named candidates, like GridSearchCV."""
+    from sklearn.model_selection import ParameterGrid
+
+    estimator, base_params = MODELS[name]
+    candidates = {}
+    for params in ParameterGrid(param_grid):
+        label = ','.join(f"{key}={value}" for key, value in sorted(params.items()))
+        candidates[f"{name}[{label}]"] = (estimator, {**base_params, **params})
+    return candidates
+
+
+def _build(estimator, params):
+    import importlib
+
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import MinMaxScaler
+
+    module, _, cls = estimator.rpartition('.')
+    return make_pipeline(MinMaxScaler(), getattr(importlib.import_module(module), cls)(**params))
+
+
+def _init_worker(path, n_splits, seed, threads):
+    from sklearn.model_selection import StratifiedKFold
+    from threadpoolctl import threadpool_limits
+
+    global _data
+    threadpool_limits(threads)
+    features, target = training_data(path)
+    folds = list(StratifiedKFold(n_splits, shuffle=True, random_state=seed).split(features, target))
+    _data = features, target, folds
+
+
+def _run_fold(estimator, params, fold):
+    """Fit and evaluate one candidate on one fold; runs in a worker process."""
+    from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+
+    start = time.perf_counter()
+    features, target, folds = _data
+    train, test = folds[fold]
+    model = _build(estimator, params)
+
+    fit_start = time.perf_counter()
+    model.fit(features[train], target[train])
+    fit_time = time.perf_counter() - fit_start
+
+    predict_start = time.perf_counter()
+    predicted = model.predict(features[test])
+    predict_time = time.perf_counter() - predict_start
+
+    if hasattr(model, 'predict_proba'):
+        score = model.predict_proba(features[test])[:, 1]
+    else:
+        score = model.decision_function(features[test])
+    truth = target[test]
+    return {
+        'n_train': len(train),
+        'n_test': len(test),
+        'fit_time': fit_time,
+        'predict_time': predict_time,
+        'accuracy': accuracy_score(truth, predicted),
+        'precision': precision_score(truth, predicted, average=AVERAGE, zero_division=0),
+        'recall': recall_score(truth, predicted, average=AVERAGE),
+        'f1': f1_score(truth, predicted, average=AVERAGE),
+        'roc_auc': roc_auc_score(truth, score),
+        'wall_time': time.perf_counter() - start,
+    }
+
+
+def read_results(path=RESULTS_PATH):
+    """Return the records of the finished tasks in the results file (ignoring a torn last line)."""
+    records = []
+    if not os.path.exists(path):
+        return records
+    with open(path, encoding='utf-8') as file:
+        for line in file:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return records
+
+
+def _task_key(name, estimator, params, fold, n_splits, seed, version):
+    return json.dumps([name, estimator, params, fold, n_splits, seed, version, SCORING], sort_keys=True,
+                      default=str)
+
+
+def run(candidates=MODELS, path=None, results_path=RESULTS_PATH, n_splits=5, n_jobs=None,
+        threads_per_job=1, seed=RANDOM_SEED):
+    """Cross-validate `candidates` (name -> (estimator, params)) in parallel, resuming from `results_path`.
+
+    Returns the records of every (candidate, fold) task, finished in this
+    call or in an earlier one.
+    """
+    version = dataset_version(path)
+    done = {record['key']: record for record in read_results(results_path)}
+    keys, pending = [], []
+    for name, (estimator, params) in candidates.items():
+        for fold in range(n_splits):
+            key = _task_key(name, estimator, params, fold, n_splits, seed, version)
+            keys.append(key)
+            if key not in done:
+                pending.append((key, name, estimator, params, fold))
+
+    if pending:
+        n_jobs = min(n_jobs or os.cpu_count() or 1, len(pending))
+        with ProcessPoolExecutor(n_jobs, initializer=_init_worker,
+                                 initargs=(path, n_splits, seed, threads_per_job)) as pool, \
+                open(results_path, 'a', encoding='utf-8') as out:
+            futures = {pool.submit(_run_fold, estimator, params, fold): (key, name, params, fold)
+                       for key, name, estimator, params, fold in pending}
+            for future in as_completed(futures):
+                key, name, params, fold = futures[future]
+                record = {'key': key, 'classifier_name': name, 'params': params, 'fold': fold,
+                          'dataset_version': version, **future.result()}
+                # One line per finished task, on disk before the next one is reported
+                out.write(json.dumps(record, default=str) + '\n')
+                out.flush()
+                os.fsync(out.fileno())
+                done[key] = record
+                print(f"{name} fold {fold}: f1={record['f1']:.3f} fit={record['fit_time']:.1f}s", flush=True)
+    return [done[key] for key in keys]
+
+
+def results_table(records):
+    """Mean metrics and timings per classifier; `wall_time` is the total over its folds."""
+    df = pd.DataFrame(records)
+    table = df.groupby('classifier_name', sort=False).agg(
+        folds=('fold', 'count'),
+        wall_time=('wall_time', 'sum'),
+        fit_time=('fit_time', 'mean'),
+        predict_time=('predict_time', 'mean'),
+        **{metric: (metric, 'mean') for metric in METRICS},
+        f1_std=('f1', 'std'),
+    )
+    return table
+
+
+def _parse_param(text):
+    key, _, values = text.partition('=')
+    return key, [json.loads(value) if value[:1].isdigit() or value in ('true', 'false', 'null') else value
+                 for value in values.split(',')]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cross-validate the readmission classifiers in parallel.")
+    parser.add_argument('--results', default=RESULTS_PATH, help="JSON-lines file of finished tasks")
+    parser.add_argument('--data', default=None, help="clean dataset (CSV or Feather)")
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--threads', type=int, default=1, help="BLAS/OpenMP threads per worker")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    run_parser = subparsers.add_parser('run', help="cross-validate the classifier zoo")
+    run_parser.add_argument('--models', nargs='+', choices=list(MODELS), default=list(MODELS))
+    grid_parser = subparsers.add_parser('grid', help="cross-validate a parameter grid of one classifier")
+    grid_parser.add_argument('model', choices=list(MODELS))
+    grid_parser.add_argument('--param', action='append', default=[], type=_parse_param,
+                             help="name=value1,value2,... (repeatable)")
+    subparsers.add_parser('report', help="print the results table of the finished tasks")
+    args = parser.parse_args()
+
+    if args.command == 'report':
+        records = read_results(args.results)
+    else:
+        if args.command == 'run':
+            candidates = {name: MODELS[name] for name in args.models}
+        else:
+            candidates = grid(args.model, dict(args.param))
+        start = time.perf_counter()
+        records = run(candidates, path=args.data, results_path=args.results, n_splits=args.folds,
+                      n_jobs=args.jobs, threads_per_job=args.threads)
+        print(f"Finished in {time.perf_counter() - start:.1f} s")
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(results_table(records).sort_values('f1', ascending=False).round(4))
+
+
+if __name__ == '__main__':
+    main()
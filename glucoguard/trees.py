@@ -0,0 +1,168 @@
+"""Flattened evaluator of the HistGradientBoosting readmission model.
+
+`flatten` copies the fitted trees into a few contiguous NumPy arrays (split
+feature, threshold, missing-value direction, children and leaf value), with
+the nodes of every tree stored one after the other in breadth-first order so
+that the right child of a node always follows its left child. `FlatForest`
+walks all trees for a block of rows at once, one tree level per step, so
+scoring a single row costs a few dozen array operations instead of sklearn's
+input validation and thread-pool dispatch. The min-max scaler can be folded
+in, in which case the evaluator takes the encoded, unscaled features.
+
+Usage (writes the flattened trees of the inference artifact):
+    python -m glucoguard.trees export
+"""
+import argparse
+import os
+
+import numpy as np
+
+from glucoguard.data import cached
+
+FOREST_PATH = "jupyter-notebooks/model_trees.npz"
+
+# Rows evaluated together; small blocks keep the (rows x trees) node matrix in cache
+CHUNK_SIZE = 512
+
+_ARRAYS = ['feature', 'threshold', 'missing_left', 'left', 'value', 'roots',
+           'baseline', 'depth', 'scale', 'offset']
+
+
+class FlatForest:
+    """Trees of a binary HistGradientBoostingClassifier as flat arrays."""
+
+    def __init__(self, feature, threshold, missing_left, left, value, roots,
+                 baseline, depth, scale=None, offset=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.missing_left = missing_left
+        self.left = left
+        self.value = value
+        self.roots = roots
+        self.baseline = float(baseline)
+        self.depth = int(depth)
+        self.scale = scale
+        self.offset = offset
+
+    def raw(self, features):
+        """Return the raw (log-odds) predictions for a 2-d array of features."""
+        X = np.asarray(features, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if self.scale is not None:
+            X = X * self.scale + self.offset
+
+        raw = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), CHUNK_SIZE):
+            chunk = np.ascontiguousarray(X[start:start + CHUNK_SIZE])
+            has_missing = np.isnan(chunk).any()
+            values = chunk.ravel()
+            row_starts = (np.arange(len(chunk)) * chunk.shape[1])[:, None]
+            nodes = np.broadcast_to(self.roots, (len(chunk), len(self.roots)))
+            # Leaves have an infinite threshold, send missing values left and are
+            # their own left child, so rows that reach a leaf early stay there
+            for _ in range(self.depth):
+                x = values.take(row_starts + self.feature.take(nodes))
+                go_right = x > self.threshold.take(nodes)
+                if has_missing:
+                    go_right |= np.isnan(x) & ~self.missing_left.take(nodes)
+                nodes = self.left.take(nodes) + go_right
+            raw[start:start + CHUNK_SIZE] = self.baseline + self.value.take(nodes).sum(axis=1)
+        return raw
+
+    def predict_proba(self, features):
+        """Return the probability of readmission, like `model.predict_proba(...)[:, 1]`."""
+        return 1.0 / (1.0 + np.exp(-self.raw(features)))
+
+    def save(self, path=FOREST_PATH):
+        """Write the arrays atomically as an uncompressed `.npz` file."""
+        arrays = {name: getattr(self, name) for name in _ARRAYS if getattr(self, name) is not None}
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=FOREST_PATH):
+        with np.load(path) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+
+def _breadth_first(nodes):
+    """Return the node indices of one sklearn tree in breadth-first order."""
+    order = [0]
+    for node in order:
+        if not nodes['is_leaf'][node]:
+            order.extend((nodes['left'][node], nodes['right'][node]))
+    return np.array(order)
+
+
+def flatten(model, scaler=None):
+    """Flatten a fitted binary HistGradientBoostingClassifier (numerical splits only).
+
+    When `scaler` (a fitted MinMaxScaler) is given, the returned forest scales
+    its input the same way before walking the trees.
+    """
+    if model.n_trees_per_iteration_ != 1:
+        raise ValueError("Only binary classifiers can be flattened")
+
+    features, thresholds, missing_left, lefts, values, roots = [], [], [], [], [], []
+    start = 0
+    depth = 0
+    for (predictor,) in model._predictors:
+        nodes = predictor.nodes
+        if nodes['is_categorical'].any():
+            raise ValueError("Trees with categorical splits cannot be flattened")
+        nodes = nodes[_breadth_first(nodes)]
+        is_leaf = nodes['is_leaf'].astype(bool)
+        # Children of the k-th split node are the (2k+1)-th and (2k+2)-th nodes
+        first_child = 1 + 2 * np.cumsum(~is_leaf) - 2
+        features.append(np.where(is_leaf, 0, nodes['feature_idx']).astype(np.intp))
+        thresholds.append(np.where(is_leaf, np.inf, nodes['num_threshold']).astype(np.float64))
+        # Leaves send missing values left too, i.e. to themselves
+        missing_left.append(is_leaf | nodes['missing_go_to_left'].astype(bool))
+        lefts.append(start + np.where(is_leaf, np.arange(len(nodes)), first_child).astype(np.intp))
+        values.append(np.where(is_leaf, nodes['value'], 0.0).astype(np.float64))
+        roots.append(start)
+        depth = max(depth, int(nodes['depth'].max()))
+        start += len(nodes)
+
+    scale = offset = None
+    if scaler is not None:
+        scale = scaler.scale_.astype(np.float64)
+        offset = scaler.min_.astype(np.float64)
+    return FlatForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        missing_left=np.concatenate(missing_left),
+        left=np.concatenate(lefts),
+        value=np.concatenate(values),
+        roots=np.array(roots, dtype=np.intp),
+        baseline=float(np.ravel(model._baseline_prediction)[0]),
+        depth=depth,
+        scale=scale,
+        offset=offset,
+    )
+
+
+def load_forest(pipeline):
+    """Return the flattened trees of `pipeline` (scaler included), built once per model version."""
+    return cached(('forest',), pipeline.version, lambda: flatten(pipeline.model, pipeline.scaler))
+
+
+def main():
+    from glucoguard.inference import ARTIFACT_PATH, load_pipeline
+
+    parser = argparse.ArgumentParser(description="Export the readmission model as flattened trees.")
+    parser.add_argument('command', choices=['export'])
+    parser.add_argument('--artifact', default=ARTIFACT_PATH)
+    parser.add_argument('--output', default=FOREST_PATH)
+    args = parser.parse_args()
+
+    pipeline = load_pipeline(args.artifact)
+    forest = flatten(pipeline.model, pipeline.scaler)
+    forest.save(args.output)
+    print(f"Wrote {args.output} ({len(forest.roots)} trees, {len(forest.value)} nodes, depth {forest.depth})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Background preloading of the heavy libraries used by the dashboard pages.
+
+Pages import seaborn, matplotlib, Plotly's figure builders, SciPy and SHAP
+only on the code paths that need them (drawing a figure missing from the
+figure cache, running the chi-square tests, explaining a prediction), so the
+first render of a page does not pay for them. `start` then imports them in a
+daemon thread once per process, so that by the time a user reaches one of
+those paths the import has usually already happened. Set GLUCOGUARD_WARMUP=0
+to disable it, e.g. on memory-constrained deployments.
+
+`benchmarks/import_time.py` checks that the pages stay within their import
+time budget and do not import these modules at the top level.
+"""
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+
+WARMUP_ENV = 'GLUCOGUARD_WARMUP'
+
+# Roughly in order of first use by a visitor starting on the Dashboard
+HEAVY_MODULES = ['plotly.express', 'plotly.graph_objects', 'matplotlib.figure', 'seaborn',
+                 'plotly.figure_factory', 'scipy.stats', 'sklearn.ensemble', 'shap']
+
+logger = logging.getLogger(__name__)
+
+_started = False
+_thread = None
+_lock = threading.Lock()
+
+
+def preload(modules=HEAVY_MODULES):
+    """Import `modules`, skipping (and logging) the ones that are not installed."""
+    start = time.perf_counter()
+    for name in modules:
+        if name in sys.modules:
+            continue
+        try:
+            importlib.import_module(name)
+        except ImportError as exc:
+            logger.warning("Could not preload %s: %s", name, exc)
+    logger.info("Preloaded %d modules in %.1f s", len(modules), time.perf_counter() - start)
+
+
+def start(modules=HEAVY_MODULES):
+    """Start preloading `modules` in the background, once per process."""
+    global _started, _thread
+    if os.environ.get(WARMUP_ENV, '1') == '0':
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+        _thread = threading.Thread(target=preload, args=(modules,), name='glucoguard-warmup', daemon=True)
+    _thread.start()
+
+
+def wait(timeout=None):
+    """Wait until the background preloading (if started) has finished."""
+    if _thread is not None:
+        _thread.join(timeout)
@@ -1,42 +1,197 @@
 import streamlit as st
 import numpy as np
-import plotly.express as px
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.graph_objects as go
+from glucoguard import cube, figure_cache, media, summaries, warmup
+from glucoguard.data import dataset_version
+from glucoguard.schema import AGE_MIDPOINTS, PHARM_GROUPS
 
 st.set_page_config(
     page_title="GlucoGuard Dashboard",
     page_icon="./assets/Page-icon.png",
 )
-st.sidebar.image("./assets/glucoguard-logo.png",)
+media.sidebar_logo()
+warmup.start()
 
 # Title
 st.title('Glucoguard Descriptive Analytics')
 
-# Load the dataset
-df = pd.read_csv('diabetes_clean.csv')
-df_gr = df.copy()
-
-# grouping the medications according to their pharmacological properties
-meds = ['metformin', 'repaglinide','nateglinide', 'chlorpropamide', 'glimepiride','acetohexamide', 'glipizide', 
-                       'glyburide', 'tolbutamide', 'pioglitazone', 'rosiglitazone','acarbose', 
-                       'miglitol', 'troglitazone', 'tolazamide', 'examide', 'citoglipton', 'insulin',
-                       'glyburide-metformin', 'glipizide-metformin', 'glimepiride-pioglitazone',
-                       'metformin-rosiglitazone','metformin-pioglitazone']
-for med in meds:
-    df_gr[med] = df_gr[med].apply(lambda x: 0 if x == 'No' else 1)
-
-df_gr['SU'] = df_gr[['chlorpropamide', 'glimepiride','acetohexamide', 'glipizide', 
-                       'glyburide', 'tolbutamide', 'tolazamide']].max(axis=1)
-df_gr[' meglitinides'] = df_gr[['repaglinide','nateglinide']].max(axis=1)
-df_gr['thiazolidinediones'] = df_gr[['pioglitazone', 'rosiglitazone','troglitazone']].max(axis=1)
-df_gr['glucosidase_inh'] = df_gr[['acarbose','miglitol']].max(axis=1)
-df_gr.drop(axis=1,columns=['chlorpropamide', 'glimepiride','acetohexamide', 'glipizide', 
-                       'glyburide', 'tolbutamide', 'tolazamide','repaglinide','nateglinide','pioglitazone', 'rosiglitazone',
-                       'acarbose','miglitol','troglitazone'],inplace=True)
-pharm_grp = ['SU',' meglitinides', 'thiazolidinediones', 'glucosidase_inh','metformin', 'insulin']
+# Figures are cached on disk per version of the data they are drawn from and
+# the widget values; the cube itself is only loaded to draw a missing figure
+summary_cube_version = cube.cube_version()
+
+def age_violin_figure():
+    """Violins of age per medication group and readmission status.
+
+    The KDE of every violin is computed here from the cube counts (with
+    Plotly's bandwidth rule) and drawn as a filled outline, so the figure
+    holds a fixed number of points instead of one point per encounter.
+    """
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    counts = cube.group_counts(cube.load_cube(), ['readmitted', 'age'])
+    counts['age_numeric'] = counts['age'].map(AGE_MIDPOINTS).astype(int)
+    counts['readmitted_binary'] = (counts['readmitted'] != 'NO').astype(int)
+    counts = counts.groupby(['Pharmacological Group', 'readmitted_binary', 'age_numeric'])['count'].sum()
+
+    fig = go.Figure()
+    statuses = [(0, 'Not Readmitted', -1), (1, 'Readmitted', 1)]
+    for (status, name, side), color in zip(statuses, px.colors.qualitative.Set1):
+        for position, group in enumerate(PHARM_GROUPS):
+            if (group, status) not in counts.index:
+                continue
+            ages = counts.loc[(group, status)]
+            ages = ages[ages > 0]
+            if ages.empty:
+                continue
+            bandwidth = summaries.bandwidth(ages.index, ages.to_numpy(), rule='silverman')
+            if not bandwidth > 0:
+                # A single encounter or age has no spread; draw a unit-width bump like `summaries.kde`
+                bandwidth = 1.0
+            grid = np.linspace(ages.index.min() - 2 * bandwidth, ages.index.max() + 2 * bandwidth, 100)
+            density = summaries.kde(ages.index, ages.to_numpy(), grid, bandwidth)
+            half_width = 0.21 * density / density.max()
+            center = position + side * 0.225
+            fig.add_trace(go.Scatter(
+                x=np.concatenate([center - half_width, (center + half_width)[::-1]]).round(4),
+                y=np.concatenate([grid, grid[::-1]]).round(2),
+                fill='toself', mode='lines', line=dict(color=color, width=1),
+                name=name, legendgroup=name, showlegend=position == 0, hoverinfo='skip',
+            ))
+    fig.update_xaxes(tickvals=list(range(len(PHARM_GROUPS))), ticktext=PHARM_GROUPS,
+                     title='Antidiabetic Medication Group')
+    fig.update_yaxes(title='Age (Years)')
+    fig.update_layout(
+        width=1200,  # Set plot width
+        height=470,  # Set plot height
+        xaxis_tickangle=-45,  # Rotate x-axis labels for readability
+        legend=dict(
+            orientation="h",  # Horizontal legend
+            yanchor="bottom",  # Align legend to the bottom
+            y=1.02,  # Push legend up
+            xanchor="center",  # Center the legend
+            x=0.5  # Set legend position
+            )
+        )
+    return fig
+
+
+def age_histogram_figure():
+    """Histogram of the age bins per readmission status, with a KDE of each status."""
+    import seaborn as sns
+    from matplotlib.figure import Figure
+
+    # Encounters per age bin and readmission status, from the cube
+    age_counts = cube.load_cube().groupby(['age', 'readmitted'], observed=True)['count'].sum().reset_index()
+
+    # Figure API instead of pyplot, so concurrent sessions never share a figure
+    fig = Figure(figsize=(8, 4))
+    ax = fig.subplots()
+    sns.histplot(data=age_counts, x='age', hue='readmitted', weights='count', ax=ax)
+
+    # KDE of each status over the age bins, scaled to counts like seaborn's kde=True
+    palette = sns.color_palette(n_colors=age_counts['readmitted'].nunique())
+    for (status, part), color in zip(age_counts.groupby('readmitted', observed=True), palette):
+        positions = part['age'].cat.codes.to_numpy()
+        grid = np.linspace(positions.min(), positions.max(), 200)
+        ax.plot(grid, summaries.kde(positions, part['count'], grid) * part['count'].sum(), color=color)
+    ax.set_xlabel('Age', fontsize=12)
+    ax.set_ylabel('Count', fontsize=12)
+    return fig
+
+
+def time_mean_figure():
+    """Bar chart of the average time in hospital per readmission status."""
+    import plotly.express as px
+
+    # Group by readmission and calculate the average time in hospital
+    time_in_hospital_mean = cube.mean(cube.load_cube(), 'readmitted', 'time_in_hospital')
+    time_in_hospital_mean_df = time_in_hospital_mean.rename('time_in_hospital').reset_index()
+
+    # Bar plot
+    fig_2 = px.bar(time_in_hospital_mean_df, 
+                   x='readmitted', 
+                   y='time_in_hospital', 
+                   title='',
+                   labels={'readmitted': 'Readmitted (<30: short-term readmission, >30: long-term readmission, NO: No readmission)', 
+                           'time_in_hospital': 'Average Time in Hospital (Days)'},
+                   color_discrete_sequence=['skyblue'])
+    
+    fig_2.update_layout(width=1000, height=400)
+    return fig_2
+
+
+def time_box_figure():
+    """Box plots of the time in hospital per medication group, from the quartiles of the value counts."""
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    counts = summaries.load_group_value_counts('time_in_hospital', PHARM_GROUPS)
+    stats = {group: summaries.box_stats(counts.columns, counts.loc[group].to_numpy()) for group in PHARM_GROUPS}
+    # Groups nobody in the dataset was prescribed have no box
+    groups = [group for group in PHARM_GROUPS if stats[group] is not None]
+    stats = [stats[group] for group in groups]
+    color = px.colors.qualitative.Plotly[0]
+
+    fig = go.Figure(go.Box(
+        x=groups,
+        q1=[s['q1'] for s in stats],
+        median=[s['median'] for s in stats],
+        q3=[s['q3'] for s in stats],
+        lowerfence=[s['lowerfence'] for s in stats],
+        upperfence=[s['upperfence'] for s in stats],
+        marker_color=color, showlegend=False,
+    ))
+    # One marker per distinct outlying value
+    fig.add_trace(go.Scatter(
+        x=[group for group, s in zip(groups, stats) for _ in s['outliers']],
+        y=[value for s in stats for value in s['outliers']],
+        mode='markers', marker=dict(color=color), showlegend=False,
+    ))
+    fig.update_xaxes(title='Antidiabetic Medication Group')
+    fig.update_yaxes(title='Time in Hospital (Days)')
+    fig.update_layout(width=1000, height=400)
+    fig.update_layout(xaxis_tickangle=-45)
+    return fig
+
+
+def change_readmission_figure():
+    """Stacked bars of the readmission proportions with and without a medication change."""
+    import plotly.express as px
+
+    # Analyze readmission rates by medication change
+    medication_change_readmission = cube.proportions(cube.load_cube(), 'change', 'readmitted')
+    medication_change_readmission_df = medication_change_readmission.reset_index()
+
+    # Melt the DataFrame for easier plotting with Plotly
+    medication_change_readmission_melted = medication_change_readmission_df.melt(id_vars='change', 
+                                                                                value_vars=medication_change_readmission.columns, 
+                                                                                var_name='readmitted', 
+                                                                                value_name='proportion')
+
+    # Create the bar plot
+    return px.bar(medication_change_readmission_melted, 
+                  x='change', 
+                  y='proportion', 
+                  color='readmitted', 
+                  title='',
+                  labels={'change': 'Medication Change', 
+                          'proportion': 'Proportion of Readmissions'},
+                  color_discrete_sequence=['skyblue', 'salmon', 'lightgreen'],
+                  barmode='stack')
+
+
+def distribution_figure(column, display_name):
+    """Bar chart of the number of encounters per value of `column`."""
+    import plotly.express as px
+
+    cat_value_counts = cube.value_counts(cube.load_cube(), column).reset_index()
+    cat_value_counts.columns = [column, 'Count']
+
+    # Create a bar chart using Plotly
+    return px.bar(cat_value_counts, x=column, y='Count', 
+                  title=f"Distribution of {display_name}",
+                  labels={column: display_name, 'Count': 'Number of Cases'},
+                  template="plotly_white")
 
 
 st.markdown("##### Discover how patient demographics influence readmission rates in diabetic care.")
@@ -59,15 +214,10 @@ selected_display_col = st.selectbox('', display_columns)
 # Map the selected display name back to the original column name
 selected_cat_col = column_mapping[selected_display_col]
 
-# Plot the distribution of the selected categorical column
-cat_value_counts = df[selected_cat_col].value_counts().reset_index()
-cat_value_counts.columns = [selected_cat_col, 'Count']
-
-# Create a bar chart using Plotly
-fig = px.bar(cat_value_counts, x=selected_cat_col, y='Count', 
-             title=f"Distribution of {selected_display_col}",
-             labels={selected_cat_col: selected_display_col, 'Count': 'Number of Cases'},
-             template="plotly_white")
+# Plot the distribution of the selected categorical column from the precomputed cube
+fig = figure_cache.plotly_figure(
+    ('summary', 'distribution', summary_cube_version, selected_cat_col, selected_display_col),
+    lambda: distribution_figure(selected_cat_col, selected_display_col))
 
 # Create two columns for side-by-side display
 col1, col2 = st.columns(2)
@@ -115,62 +265,9 @@ with col2:
 
 st.markdown("## More Data Insights..")
 
-# Define a mapping for age categories to numerical values
-age_mapping = {
-    '[0-10)': 5,
-    '[10-20)': 15,
-    '[20-30)': 25, 
-    '[30-40)': 35, 
-    '[40-50)': 45,
-    '[50-60)': 55,
-    '[60-70)': 65,
-    '[70-80)': 75,
-    '[80-90)': 85,
-    '[90-100)': 95
-}
-
-# Map the age categories to their corresponding numeric values
-df_gr['age_numeric'] = df_gr['age'].map(age_mapping)
-
-
-# Melt the DataFrame
-df_melted2 = pd.melt(df_gr, id_vars=['age', 'readmitted','age_numeric'], 
-                    value_vars=pharm_grp, 
-                    var_name='Pharmacological Group', 
-                    value_name='Medication Use')
-
-# Filter rows where Medication Use is 1 (i.e., the medication was used)
-df_filtered2 = df_melted2[df_melted2['Medication Use'] == 1].copy()  # Make a copy to avoid SettingWithCopyWarning
-
-# Set readmitted as a categorical variable using .loc
-df_filtered2['readmitted_binary'] = df_filtered2['readmitted'].apply(lambda x: 0 if x == 'NO' else 1)
-
 # Define the correct order for the age categories
 age_order = ['[0-10)', '[10-20)', '[20-30)', '[30-40)', '[40-50)', '[50-60)', '[60-70)', '[70-80)', '[80-90)', '[90-100)']
 
-# Group by readmission and calculate the average time in hospital
-time_in_hospital_mean = df.groupby('readmitted')['time_in_hospital'].mean()
-time_in_hospital_mean_df = time_in_hospital_mean.reset_index()
-
-# Melt the DataFrame to reshape it for the box plot
-df_melted3 = pd.melt(df_gr, id_vars=['time_in_hospital'], 
-                    value_vars=pharm_grp, 
-                    var_name='Pharmacological Group', 
-                    value_name='Medication Use')
-
-# Analyze readmission rates by medication change
-medication_change_readmission = df.groupby('change')['readmitted'].value_counts(normalize=True).unstack()
-medication_change_readmission_df = medication_change_readmission.reset_index()
-
-# Melt the DataFrame for easier plotting with Plotly
-medication_change_readmission_melted = medication_change_readmission_df.melt(id_vars='change', 
-                                                                            value_vars=medication_change_readmission.columns, 
-                                                                            var_name='readmitted', 
-                                                                            value_name='proportion')
-
-# Filter rows where Medication Use is 1 (i.e., the medication was used)
-df_filtered3 = df_melted3[df_melted3['Medication Use'] == 1]
-
 # Create a dropdown menu to select which plot to display
 plot_option = st.selectbox(
     'Select the plot you want to display:',
@@ -182,35 +279,10 @@ plot_option = st.selectbox(
 )
 
 # Conditional logic to display the selected plot and its explanation
+# (only the data of the selected plot is prepared)
 if plot_option == 'Distribution of Age by Medication Group Usage':
     # Create the violin plot
-    figv = px.violin(df_filtered2, 
-                    x='Pharmacological Group', 
-                    y='age_numeric', 
-                    color='readmitted_binary', 
-                    title='',
-                    category_orders={'age': age_order},  # Order age categories
-                    color_discrete_sequence=px.colors.qualitative.Set1,
-                    labels={
-                     'Pharmacological Group': 'Antidiabetic Medication Group',  # Custom x-axis title
-                     'age_numeric': 'Age (Years)',  # Custom y-axis title
-                     'readmitted_binary': ''  # Legend label for color
-                 }
-                    )
-    figv.update_layout(
-        width=1200,  # Set plot width
-        height=470,  # Set plot height
-        xaxis_tickangle=-45,  # Rotate x-axis labels for readability
-        legend=dict(
-            orientation="h",  # Horizontal legend
-            yanchor="bottom",  # Align legend to the bottom
-            y=1.02,  # Push legend up
-            xanchor="center",  # Center the legend
-            x=0.5  # Set legend position
-            )
-        )
-    figv.update_traces(width=0.9)
-    figv.for_each_trace(lambda trace: trace.update(name='Readmitted' if trace.name == '1' else 'Not Readmitted'))
+    figv = figure_cache.plotly_figure(('summary', 'age_violin', summary_cube_version), age_violin_figure)
 
     # Create two columns for side-by-side display
     col1, col2 = st.columns(2)
@@ -229,15 +301,13 @@ if plot_option == 'Distribution of Age by Medication Group Usage':
         """)
 
 elif plot_option == 'Distribution of Age by Readmission Status':
-    plt.figure(figsize=(8, 4))
-    sns.histplot(data=df, x='age', hue='readmitted', bins=20, kde=True)
-    plt.xlabel('Age', fontsize=12)
-    plt.ylabel('Count', fontsize=12)
+    # Rendered once to PNG and served from the figure cache
+    age_histogram = figure_cache.png(('summary', 'age_histogram', summary_cube_version), age_histogram_figure)
 
     col1, col2 = st.columns(2)
 
     with col1:
-        st.pyplot(plt)
+        st.image(age_histogram, use_column_width=True)
 
     with col2:
         st.markdown("""
@@ -249,16 +319,7 @@ elif plot_option == 'Distribution of Age by Readmission Status':
         """)
 
 elif plot_option == 'Average Time in Hospital by Readmission Status':
-    # Bar plot
-    fig_2 = px.bar(time_in_hospital_mean_df, 
-                   x='readmitted', 
-                   y='time_in_hospital', 
-                   title='',
-                   labels={'readmitted': 'Readmitted (<30: short-term readmission, >30: long-term readmission, NO: No readmission)', 
-                           'time_in_hospital': 'Average Time in Hospital (Days)'},
-                   color_discrete_sequence=['skyblue'])
-    
-    fig_2.update_layout(width=1000, height=400)
+    fig_2 = figure_cache.plotly_figure(('summary', 'time_mean', summary_cube_version), time_mean_figure)
 
     col1, col2 = st.columns(2)
 
@@ -275,15 +336,8 @@ elif plot_option == 'Average Time in Hospital by Readmission Status':
 
 elif plot_option == 'Time in Hospital by Medication Group Usage':
     # Create the box plot
-    figbx = px.box(df_filtered3,  
-                   x='Pharmacological Group', 
-                   y='time_in_hospital', 
-                   title='',
-                   labels={'time_in_hospital': 'Time in Hospital (Days)', 
-                           'Pharmacological Group': 'Antidiabetic Medication Group'})  
+    figbx = figure_cache.plotly_figure(('summary', 'time_box', dataset_version()), time_box_figure)
 
-    figbx.update_layout(width=1000, height=400)
-    figbx.update_layout(xaxis_tickangle=-45)
 
     col1, col2 = st.columns(2)
 
@@ -298,16 +352,8 @@ elif plot_option == 'Time in Hospital by Medication Group Usage':
         """)
 
 elif plot_option == 'Readmission Rates by Medication Change':
-    # Create the bar plot
-    fig_3 = px.bar(medication_change_readmission_melted, 
-                   x='change', 
-                   y='proportion', 
-                   color='readmitted', 
-                   title='',
-                   labels={'change': 'Medication Change', 
-                           'proportion': 'Proportion of Readmissions'},
-                   color_discrete_sequence=['skyblue', 'salmon', 'lightgreen'],
-                   barmode='stack')
+    fig_3 = figure_cache.plotly_figure(('summary', 'change_readmission', summary_cube_version),
+                                       change_readmission_figure)
 
     col3, col4 = st.columns(2)
 
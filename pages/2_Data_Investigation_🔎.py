@@ -1,19 +1,18 @@
 import streamlit as st
-import pandas as pd
-import seaborn as sns
-import matplotlib.pyplot as plt
-import plotly.figure_factory as ff
-import numpy as np
-from scipy.stats import chi2_contingency
+from glucoguard import correlation, diagnoses, figure_cache, media, warmup
+from glucoguard.association import CATEGORICAL_FEATURES, load_readmission_associations
+from glucoguard.data import dataset_version
 
-# Load your data
-df = pd.read_csv("diabetes_clean.csv")
+# Version of the sufficient statistics of the numeric features; any
+# correlation matrix is derived from them without rescanning the rows
+correlation_version = correlation.stats_version()
 
 st.set_page_config(
     page_title="GlucoGuard Dashboard",
     page_icon="./assets/Page-icon.png",
 )
-st.sidebar.image("./assets/glucoguard-logo.png",)
+media.sidebar_logo()
+warmup.start()
 
 # Set the title of the Streamlit app
 st.title("Glucoguard Diagnostic Analytics")
@@ -30,30 +29,8 @@ The Pearson correlation coefficient measures the strength and direction of the l
 - A value of **0** indicates **no linear correlation** between the variables. 
 """)
 
-# Binarize some categorical features
-df['readmitted'] = df['readmitted'].apply(lambda x: 0 if x == 'NO' else 1)
-df['metformin'] = df['metformin'].apply(lambda x: 0 if x == 'No' else 1)
-df['insulin'] = df['insulin'].apply(lambda x: 0 if x == 'No' else 1)
-df['change'] = df['change'].apply(lambda x: 0 if x == 'No' else 1)
-df['gender'] = df['gender'].apply(lambda x: 1 if x == 'Male' else 0)
-
-# Convert 'age' ranges to the midpoint of the range
-age_map = {
-    "[0-10)": 5,
-    "[10-20)": 15,
-    "[20-30)": 25,
-    "[30-40)": 35,
-    "[40-50)": 45,
-    "[50-60)": 55,
-    "[60-70)": 65,
-    "[70-80)": 75,
-    "[80-90)": 85,
-    "[90-100)": 95
-}
-df['age'] = df['age'].map(age_map)
-
-# Select only numerical columns
-numerical_cols = df.select_dtypes(include=['int64', 'float64']).columns
+# Numerical columns (binary features are encoded as 0/1 and age as the midpoint of the range)
+numerical_cols = correlation.FEATURES
 
 # Exclude specific features
 excluded_features = ['patient_nbr', 'encounter_id']
@@ -76,7 +53,7 @@ friendly_name_map = {
 reverse_friendly_name_map = {v: k for k, v in friendly_name_map.items()}
 
 # Ensure 'readmitted' is part of the selected features
-if 'readmitted' not in df.columns:
+if 'readmitted' not in numerical_cols:
     st.error("The 'readmitted' feature is not in the dataset. Please check your data.")
 else:
     # Determine available options for multiselect
@@ -107,22 +84,30 @@ else:
     if len(selected_features) < 2:
         st.info("Please select at least one feature to display the correlation heatmap.")
     else:
-        # Calculate the correlation matrix based on selected features
-        corr_matrix = df[selected_features].corr()
-
-        # Create a heatmap using Plotly with 2 decimal precision for annotations
-        z = corr_matrix.values
-        annotations = [[f"{value:.2f}" for value in row] for row in z]  # Format values to 2 decimal places
-
-        fig = ff.create_annotated_heatmap(
-            z=z,
-            x=[friendly_name_map[col] for col in corr_matrix.columns],
-            y=[friendly_name_map[col] for col in corr_matrix.columns],
-            colorscale='RdBu',
-            showscale=True,
-            annotation_text=annotations,  # Use formatted annotations
-            textfont=dict(color='black')  # Set text color for visibility
-        )
+        def correlation_heatmap():
+            import plotly.figure_factory as ff
+
+            # Calculate the correlation matrix based on selected features
+            corr_matrix = correlation.load_stats().corr(selected_features)
+
+            # Create a heatmap using Plotly with 2 decimal precision for annotations
+            z = corr_matrix.values
+            annotations = [[f"{value:.2f}" for value in row] for row in z]  # Format values to 2 decimal places
+
+            return ff.create_annotated_heatmap(
+                z=z,
+                x=[friendly_name_map[col] for col in corr_matrix.columns],
+                y=[friendly_name_map[col] for col in corr_matrix.columns],
+                colorscale='RdBu',
+                showscale=True,
+                annotation_text=annotations,  # Use formatted annotations
+                textfont=dict(color='black')  # Set text color for visibility
+            )
+
+        # Served from the figure cache, shared by all sessions and server restarts
+        fig = figure_cache.plotly_figure(
+            ('investigation', 'correlation_heatmap', correlation_version, selected_features),
+            correlation_heatmap)
 
         # Display the interactive heatmap
         st.plotly_chart(fig)
@@ -145,22 +130,16 @@ The Chi-Square test evaluates whether there is a significant association between
 
 **A low p-value** (typically < 0.05) indicates that we can reject the null hypothesis of independence, 
 suggesting a **significant relationship** between the variables.
+
+**Cramér's V** measures the strength of the association, from **0** (no association) to **1** (perfect association).
 """)
 
-# Function to perform Chi-Square Test and collect results
-def chi_square_test(var1, var2):
-    results = []
-    for feature in var2:
-        if df[var1].dtype.kind in 'bi' and df[feature].dtype.kind in 'bi':
-            contingency_table = pd.crosstab(df[var1], df[feature])
-            chi2, p, dof, expected = chi2_contingency(contingency_table)
-            results.append((feature, chi2, p, dof, contingency_table))
-        else:
-            results.append((feature, None, None, None, None))  # Append None for error handling
-    return results
+# Chi-Square results of every categorical feature against readmission,
+# computed once per dataset version and shared by all sessions
+chi_square_results = load_readmission_associations()
 
 # User selects features for Chi-Square test
-features = ['metformin', 'insulin', 'change', 'gender']
+features = CATEGORICAL_FEATURES
 selected_features = st.multiselect('',options=features)
 
 # Place the "Select All" checkbox below the multiselect box
@@ -172,37 +151,20 @@ if select_all:
 
 # Only perform Chi-Square tests if at least one feature is selected
 if selected_features:
-    # Perform Chi-Square tests for the selected features
-    chi_square_results = chi_square_test('readmitted', selected_features)
-
-    # Calculate Pearson Correlation Coefficients for selected features
-    pearson_results = {
-        'Feature': [],
-        'Pearson Correlation Coefficient': [],
-    }
-
-    for feature in selected_features:
-        pearson_coef = df['readmitted'].corr(df[feature])
-        pearson_results['Feature'].append(feature)
-        pearson_results['Pearson Correlation Coefficient'].append(pearson_coef)
-
-    # Store Chi-Square test results in a DataFrame
-    chi_square_data = []
-    for feature, chi2, p, dof, _ in chi_square_results:
-        if chi2 is not None:  # Only add valid results
-            chi_square_data.append({
-                'Feature': feature,
-                'Chi-Square Statistic': chi2,
-                'p-value': p,
-                'Degrees of Freedom': dof,
-            })
-
-    # Combine results into a single DataFrame
-    chi_square_df = pd.DataFrame(chi_square_data)
-    pearson_df = pd.DataFrame(pearson_results)
-
-    # Merge results
-    combined_results = pearson_df.merge(chi_square_df, on='Feature')
+    # Look up the precomputed results of the selected features; the Pearson
+    # coefficient is only defined for the features with a numeric encoding
+    combined_results = chi_square_results.loc[selected_features].reset_index().rename(columns={
+        'feature': 'Feature',
+        'cramers_v': "Cramér's V",
+        'chi2': 'Chi-Square Statistic',
+        'p_value': 'p-value',
+        'dof': 'Degrees of Freedom',
+    })
+    readmission_corr = correlation.load_stats().corr()['readmitted']
+    combined_results.insert(1, 'Pearson Correlation Coefficient',
+                            combined_results['Feature'].map(readmission_corr))
+    combined_results = combined_results[['Feature', 'Pearson Correlation Coefficient', "Cramér's V",
+                                         'Chi-Square Statistic', 'p-value', 'Degrees of Freedom']]
 
     # Display the combined results in Streamlit
     st.markdown("### Comparison of Correlation and Chi-Square Test")
@@ -211,12 +173,53 @@ if selected_features:
     # Results Interpretation
     st.markdown("### Interpretations")
     st.markdown("""
-    While the Pearson correlations for selected features with readmission are weak, 
-    the Chi-square tests show **significant associations**. This implies that these 
-    variables have a significant relationship with whether a patient is readmitted, 
-    even though their linear relationships are minimal.
+    While the Pearson correlations and the strength of the association (Cramér's V) of the 
+    selected features with readmission are weak, the Chi-square tests can still show 
+    **significant associations**. This implies that these variables may have a significant 
+    relationship with whether a patient is readmitted, even though the relationships are small in size.
     """)
 
 # Optional: Display a message when no features are selected
 else:
     st.info("Please select at least one feature to perform the analysis.")
+
+# Readmission per clinical group of the ICD-9 diagnoses
+st.header("Readmission by Diagnosis Group")
+st.markdown("""
+The diagnosis codes (ICD-9) of every encounter are grouped into clinical categories, such as circulatory, 
+respiratory or diabetes (250.xx) diagnoses. Compare the readmission rate of the groups, and the most 
+frequent codes within a group.
+""")
+
+position_labels = {label: column for column, label in diagnoses.POSITIONS.items()}
+position = position_labels[st.selectbox('Diagnosis position:', options=list(position_labels))]
+
+# Counted from the encoded diagnoses and the inverted index, built once per dataset version
+group_table = diagnoses.readmission_by_group(position)
+group_table = group_table[group_table['encounters'] > 0]
+
+
+def diagnosis_group_chart():
+    import plotly.express as px
+
+    fig = px.bar(group_table.reset_index(), x='group', y='readmission_rate',
+                 hover_data=['encounters', 'readmitted'],
+                 labels={'group': 'Diagnosis Group', 'readmission_rate': 'Readmission Rate',
+                         'encounters': 'Encounters', 'readmitted': 'Readmitted'})
+    fig.update_layout(yaxis_tickformat='.0%')
+    return fig
+
+
+fig = figure_cache.plotly_figure(('investigation', 'diagnosis_groups', dataset_version(), position),
+                                 diagnosis_group_chart)
+st.plotly_chart(fig)
+
+if position != 'any':
+    selected_group = st.selectbox('Diagnosis group:', options=list(group_table.index))
+    code_table = diagnoses.readmission_by_code(position, selected_group).head(10)
+    st.markdown(f"### Most frequent {selected_group.lower()} codes")
+    st.write(code_table.drop(columns='group').rename(columns={
+        'encounters': 'Encounters',
+        'readmitted': 'Readmitted',
+        'readmission_rate': 'Readmission Rate',
+    }))
@@ -1,15 +1,14 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import pickle
-import shap
-import matplotlib.pyplot as plt
-from sklearn.preprocessing import MinMaxScaler
-
-# Load the saved model
-model_pkl_file = "jupyter-notebooks/model.pkl"
-with open(model_pkl_file, 'rb') as file:
-    model = pickle.load(file)
+import os
+import time
+from glucoguard import media, scoring, warmup
+from glucoguard.explain import load_explainer
+from glucoguard.force_plot import force_plot
+from glucoguard.inference import load_pipeline
+from glucoguard.service import SERVICE_URL_ENV, ServiceClient
+from glucoguard.trees import load_forest
 
 st.set_page_config(
     page_title="GlucoGuard Dashboard",
@@ -22,7 +21,28 @@ st.set_page_config(
 st.title("Readmission Prediction")
 
 # Sidebar configuration
-st.sidebar.image("./assets/glucoguard-logo.png")
+media.sidebar_logo()
+warmup.start()
+
+# Use the prediction service when one is configured, otherwise load the exported
+# model, scaler and encoders in-process (once per process, shared by all sessions).
+# An unreachable service falls back to the in-process model.
+service_url = os.environ.get(SERVICE_URL_ENV)
+if service_url:
+    client = ServiceClient(service_url)
+    try:
+        service_info = client.info()
+    except OSError as exc:
+        st.error(f"The prediction service at {service_url} is not available ({exc}). "
+                 "Predictions are made with the model loaded in the dashboard instead.")
+        service_url = None
+if service_url:
+    feature_columns = service_info['feature_columns']
+    st.sidebar.caption(f"Model version {service_info['model_version']} (prediction service at {service_url})")
+else:
+    pipeline = load_pipeline()
+    feature_columns = pipeline.feature_columns
+    st.sidebar.caption(f"Model version {pipeline.version} (loaded in {pipeline.load_seconds * 1000:.0f} ms)")
 st.markdown(
 """
     ##### This tool helps you predict the chances of a patient being readmitted by analyzing their key health information, supporting better care decisions.
@@ -86,6 +106,16 @@ medications = [
     'Thiazolidinediones', 'Glucosidase Inhibitors'
 ]
 
+# Model feature of each medication checkbox
+medication_features = {
+    'Metformin': 'metformin', 'Examide': 'examide', 'Citoglipton': 'citoglipton',
+    'Insulin': 'insulin', 'Glyburide-Metformin': 'glyburide-metformin',
+    'Glipizide-Metformin': 'glipizide-metformin', 'Glimepiride-Pioglitazone': 'glimepiride-pioglitazone',
+    'Metformin-Rosiglitazone': 'metformin-rosiglitazone', 'Metformin-Pioglitazone': 'metformin-pioglitazone',
+    'Sulfonylureas': 'SU', 'Mitiglinides': 'meglitinides',
+    'Thiazolidinediones': 'thiazolidinediones', 'Glucosidase Inhibitors': 'glucosidase_inh'
+}
+
 # Initialize a dictionary to hold medication selections
 med_inputs = {}
 
@@ -127,7 +157,7 @@ input_data = pd.DataFrame({
     'race_Other': [1 if race == "Other" else 0],
     'gender_Female': [1 if gender == "Female" else 0],
     'gender_Male': [1 if gender == "Male" else 0],
-    'gender_Unknown': [1 if gender == "Unknown" else 0],
+    'gender_Unknown/Invalid': [1 if gender == "Unknown" else 0],
     'change_Ch': [1 if change == "Yes" else 0],
     'change_No': [1 if change == "No" else 0],
     'diabetesMed_Yes': [1 if diabetesMed == "Yes" else 0],
@@ -136,42 +166,50 @@ input_data = pd.DataFrame({
 
 # Add the medications to the input DataFrame using checkbox inputs
 for med in medications:
-    input_data[med] = [binary_map['Yes'] if med_inputs[med] else binary_map['No']]
+    input_data[medication_features[med]] = [binary_map['Yes'] if med_inputs[med] else binary_map['No']]
 
-# Normalize the input data using the same scaler as in the training process
-scaler = MinMaxScaler()
-normalized_input_data = scaler.fit_transform(input_data)
-
-def st_shap(plot, height=None):
-    """Function to display a SHAP plot in Streamlit."""
-    shap_html = f"<head>{shap.getjs()}</head><body>{plot.html()}</body>"
-    st.components.v1.html(shap_html, height=height)
+# Put the features in the order the model was trained on
+input_data = input_data[feature_columns]
 
 # Prediction button
 if st.button("Predict Readmission"):
-    prediction = model.predict(normalized_input_data)
-    st.write("The model predicts the patient will " + ("be readmitted." if prediction[0] == 1 else "not be readmitted."))
-    
-    # SHAP analysis
-    explainer = shap.Explainer(model)
-    shap_values = explainer(normalized_input_data)
+    probability = None
+    if service_url:
+        try:
+            probability = client.predict(input_data.iloc[0])
+            expected_value, row_shap_values = client.explain(input_data.iloc[0])
+        except OSError as exc:
+            st.error(f"The prediction service at {service_url} is not available ({exc}). "
+                     "The prediction is made with the model loaded in the dashboard instead.")
+            probability = None
+    if probability is None:
+        pipeline = load_pipeline()
+        input_data = input_data[pipeline.feature_columns]
+
+        # Score the row on the flattened trees (same result as the sklearn model)
+        probability = load_forest(pipeline).predict_proba(input_data)[0]
+
+        # SHAP analysis (the explainer is built once per model version and
+        # explanations of previously seen inputs are reused)
+        expected_value, row_shap_values = load_explainer(pipeline).explain(input_data)
+
+    st.write("The model predicts the patient will " + ("be readmitted." if probability > 0.5 else "not be readmitted."))
     
     st.subheader("SHAP Analysis")
     
     # SHAP Force Plot
     st.subheader("Force Plot")
     
-    shap.initjs()  # Initialize JavaScript for SHAP
-    
     # Only include features that have non-zero or non-empty input
 
     # Filter out the features that were not selected or are irrelevant
-    relevant_features = input_data.columns[(input_data != 0).any(axis=0)]  # Filter non-zero features
+    relevant_mask = (input_data != 0).any(axis=0).to_numpy()  # Filter non-zero features
+    relevant_features = input_data.columns[relevant_mask]
     relevant_input_data = input_data[relevant_features]  # Filter input data accordingly
-    relevant_shap_values = shap_values.values[0][:len(relevant_features)]  # Filter SHAP values to match
+    relevant_shap_values = row_shap_values[relevant_mask]  # Filter SHAP values to match
 
     # Display filtered force plot
-    st_shap(shap.force_plot(explainer.expected_value, relevant_shap_values, relevant_input_data.iloc[0, :]))
+    force_plot(expected_value, relevant_shap_values, relevant_input_data.iloc[0, :], key="force_plot")
 
     st.subheader("Explanation:")
     st.write("The plot shows which patient's characteristics contributed to the possibility of this patient's readmission. Features in red contributed to a higher likelihood of readmission (a positive prediction) while the ones in blue contributed to a lower likelihood of readmission (a negative prediction).")
@@ -196,4 +234,33 @@ if st.button("Predict Readmission"):
     else:
         st.write("No negative contributions for this prediction.")
 
+# Batch scoring of a whole cohort
+st.markdown("<h2 style='font-size:20px;'>Score a Cohort</h2>", unsafe_allow_html=True)
+st.write("Upload the patients to score (for example a ward or a day's discharges) as a CSV or Parquet file with the same columns as the clean dataset.")
+
+cohort_file = st.file_uploader("Patient cohort", type=["csv", "parquet"])
+
+# The scores are kept in the session, keyed on the uploaded file, so that the
+# rerun triggered by the download button (or any other widget) still shows them
+if cohort_file is not None and st.button("Score Cohort"):
+    try:
+        cohort = scoring.read_cohort(cohort_file, cohort_file.name)
+    except ValueError as exc:
+        st.error(str(exc))
+        st.session_state.pop('cohort_scores', None)
+    else:
+        t_start = time.perf_counter()
+        cohort_results = scoring.score(cohort, load_pipeline())
+        st.session_state['cohort_scores'] = (cohort_file.file_id, cohort_results, time.perf_counter() - t_start)
+
+scores = st.session_state.get('cohort_scores')
+if scores is not None and cohort_file is not None and scores[0] == cohort_file.file_id:
+    _, cohort_results, scoring_time = scores
+    st.write(f"Scored **{len(cohort_results):,}** patients in {scoring_time:.2f} s "
+             f"({len(cohort_results) / max(scoring_time, 1e-9):,.0f} rows/second). "
+             f"**{int(cohort_results['predicted_readmission'].sum()):,}** are predicted to be readmitted.")
+    st.dataframe(cohort_results.head(100))
+    st.download_button("Download Results", cohort_results.to_csv(index=False),
+                       file_name="readmission_predictions.csv", mime="text/csv")
+
 st.write("**Please note that if the characteristcs contributing to the prediction are not clinically significant, consider clinical judgement over the result of this tool.**")
@@ -0,0 +1,96 @@
+import streamlit as st
+from glucoguard import figure_cache, media, patients, warmup
+
+st.set_page_config(
+    page_title="GlucoGuard Dashboard",
+    page_icon="./assets/Page-icon.png",
+)
+media.sidebar_logo()
+warmup.start()
+
+# Title
+st.title("Glucoguard Patient History")
+st.markdown("#### Follow the encounters of a patient and see how earlier stays relate to readmission.")
+
+# Figures are cached per version of the patient index they are drawn from
+patient_index_version = patients.index_version()
+
+# Readmission by earlier encounters of the same patient
+st.header("Readmission and Earlier Encounters")
+st.markdown("""
+Repeated readmissions are a known risk factor for diabetic patients. The encounters of every patient are 
+ordered by their encounter number, which increases over time, so each encounter can be compared with the 
+patient's earlier stays.
+""")
+
+
+def prior_encounters_figure():
+    import plotly.express as px
+
+    table = patients.readmission_by_prior_encounters().reset_index()
+    fig = px.bar(table, x='prior_encounters', y='readmission_rate', hover_data=['encounters', 'readmitted'],
+                 labels={'prior_encounters': 'Earlier Encounters of the Patient',
+                         'readmission_rate': 'Readmission Rate', 'encounters': 'Encounters',
+                         'readmitted': 'Readmitted'})
+    fig.update_layout(yaxis_tickformat='.0%')
+    return fig
+
+
+fig = figure_cache.plotly_figure(('patients', 'prior_encounters', patient_index_version), prior_encounters_figure)
+st.plotly_chart(fig)
+
+st.markdown("### Readmission by Outcome of the Previous Encounter")
+previous_outcome = patients.readmission_by_previous_outcome().rename(columns={
+    'encounters': 'Encounters',
+    'readmitted': 'Readmitted',
+    'readmission_rate': 'Readmission Rate',
+})
+previous_outcome.index.name = 'Previous Encounter'
+st.write(previous_outcome)
+
+# Drill-down into the encounters of one patient
+st.header("Patient Lookup")
+# Labels of the patients with the most encounters, mapped back to their patient numbers
+frequent_labels = {f"Patient {patient} ({count} encounters)": patient
+                   for patient, count in patients.frequent_patients().items()}
+selected_patient = frequent_labels[st.selectbox('Patients with the most encounters:', options=list(frequent_labels))]
+typed_patient = st.text_input('Or enter a patient number:', value='')
+
+patient = selected_patient
+if typed_patient.strip():
+    try:
+        patient = int(typed_patient)
+    except ValueError:
+        patient = None
+        st.error("Please enter a patient number (digits only).")
+
+if patient is not None:
+    try:
+        patient_history = patients.history(patient)
+    except KeyError:
+        st.info(f"No encounters were found for patient {patient}.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        col1.metric('Encounters', len(patient_history))
+        col2.metric('Readmissions', int((patient_history['readmitted'] != 'NO').sum()))
+        col3.metric('Days in Hospital', int(patient_history['time_in_hospital'].sum()))
+
+        st.markdown(f"### Encounters of Patient {patient}")
+        st.dataframe(patient_history.rename(columns={
+            'encounter_id': 'Encounter',
+            'age': 'Age',
+            'admission_type_id': 'Admission Type',
+            'discharge_disposition_id': 'Discharge Disposition',
+            'time_in_hospital': 'Days in Hospital',
+            'num_lab_procedures': 'Lab Procedures',
+            'num_medications': 'Medications',
+            'number_inpatient': 'Inpatient Visits (Prior Year)',
+            'diag_1': 'Primary Diagnosis',
+            'insulin': 'Insulin',
+            'change': 'Medication Change',
+            'readmitted': 'Readmitted',
+            'prior_encounters': 'Earlier Encounters',
+            'previous_outcome': 'Previous Outcome',
+            'prior_readmissions': 'Earlier Readmissions',
+            'prior_days': 'Earlier Days in Hospital',
+        }), hide_index=True)
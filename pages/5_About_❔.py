@@ -1,10 +1,11 @@
 import streamlit as st
+from glucoguard import media
 
 st.set_page_config(
     page_title="GlucoGuard Dashboard",
     page_icon="./assets/Page-icon.png",
 )
-st.sidebar.image("./assets/glucoguard-logo.png",)
+media.sidebar_logo()
 
 st.write("# About #")
 